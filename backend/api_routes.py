@@ -11,7 +11,7 @@ from discord.ext import commands
 from auth import require_auth
 from database import get_database, DatabaseError
 from shared import guild_filters
-from swear_filter_updated import SwearFilter
+from swear_filter_updated import SCAN_BUDGET_US, GuildFilter
 logger = logging.getLogger(__name__)
 
 # ──────────────────────────────────────────────────────────────────
@@ -135,12 +135,14 @@ async def add_guild_words(guild_id: int):
         # ✅ Live-update bot filter
         if word_type == "custom":
             if guild_id in guild_filters:
-                guild_filters[guild_id].swear_words.update(clean_words)
+                guild_filters[guild_id].add_words(clean_words)
             else:
-                guild_filters[guild_id] = SwearFilter(set(current))
-        else:
-            if guild_id in guild_filters and hasattr(guild_filters[guild_id], "safe_words"):
-                guild_filters[guild_id].safe_words.update(clean_words)
+                guild_filters[guild_id] = GuildFilter(
+                    current, whitelist_words=settings.get("whitelist_words", []),
+                    scan_budget_us=settings.get("scan_budget_us") or SCAN_BUDGET_US
+                )
+        elif guild_id in guild_filters:
+            guild_filters[guild_id].add_whitelist_words(clean_words)
 
         # ✅ Invalidate cache so bot re-reads fresh data
         if guild_cache:
@@ -191,7 +193,10 @@ async def remove_guild_words(guild_id: int):
 
         # ✅ Live filter update
         if word_type == "custom" and guild_id in guild_filters:
-            guild_filters[guild_id] = SwearFilter(set(current))
+            guild_filters[guild_id].remove_words(removed)
+        elif word_type == "whitelist" and guild_id in guild_filters:
+            # Only the guild's overlay shrinks; the shared dictionary is untouched
+            guild_filters[guild_id].remove_whitelist_words(removed)
 
         # ✅ Invalidate cache
         if guild_cache:
@@ -502,6 +507,7 @@ async def get_guild_logs(guild_id: int):
                     'delete_only': 'Delete',
                     'delete_timeout': 'Delete + Timeout', 
                     'delete_timeout_kick': 'Delete + Timeout + Kick',
+                    'censor_repost': 'Censor + Repost',
                     'delete': 'Delete',
                     'timeout': 'Timeout',
                     'kick': 'Kick',
@@ -561,6 +567,7 @@ async def get_guild_settings_live(guild_id: int):
             "bypass_channels": raw.get("bypass_channels", []),
             "custom_words": raw.get("custom_words", []),
             "whitelist_words": raw.get("whitelist_words", []),
+            "scan_budget_us": raw.get("scan_budget_us"),  # null = engine default
         }
 
         return jsonify(success=True, settings=settings)
@@ -578,7 +585,7 @@ async def update_guild_settings_api(guild_id: int):
         data = request.get_json(force=True)
 
         # Validate new action system
-        allowed_actions = {"delete_only", "delete_timeout", "delete_timeout_kick"}
+        allowed_actions = {"delete_only", "delete_timeout", "delete_timeout_kick", "censor_repost"}
         if data.get("action_type") and data["action_type"] not in allowed_actions:
             return jsonify(success=False, error="Invalid action type"), 400
 
@@ -592,6 +599,12 @@ async def update_guild_settings_api(guild_id: int):
         if "kick_after_swears" in data and not 1 <= data["kick_after_swears"] <= 50:
             return jsonify(success=False, error="Kick threshold must be 1-50"), 400
 
+        # Per-message filter CPU budget; null restores the default
+        budget = data.get("scan_budget_us")
+        if budget is not None and (not isinstance(budget, int) or isinstance(budget, bool)
+                                   or not 1000 <= budget <= 1000000):
+            return jsonify(success=False, error="Scan budget must be 1000-1000000 microseconds"), 400
+
         # Validate kick > timeout logic
         if ("kick_after_swears" in data and "timeout_after_swears" in data and 
             data["kick_after_swears"] <= data["timeout_after_swears"]):
@@ -600,6 +613,10 @@ async def update_guild_settings_api(guild_id: int):
         db = get_database()
         await db.update_guild_settings(guild_id, data)
 
+        # Live-update the bot filter's budget
+        if "scan_budget_us" in data and guild_id in guild_filters:
+            guild_filters[guild_id].scan_budget_us = budget or SCAN_BUDGET_US
+
         # Invalidate cache
         if guild_cache:
             await guild_cache.invalidate_guild(guild_id)
@@ -639,6 +656,14 @@ async def get_guild_stats_api(guild_id: int):
         bot = _need_bot()
         guild = bot.get_guild(guild_id)
         
+        # Per-stage filter timings and hit counts since the bot started, plus the
+        # verdict cache's counters (shared with guilds that have the same rules)
+        swear_filter = guild_filters.get(guild_id)
+        filter_stages = None
+        if swear_filter:
+            filter_stages = swear_filter.stage_stats.snapshot()
+            filter_stages['verdict_cache'] = swear_filter.verdict_cache.stats()
+        
         # ✅ FIX: Ensure all required fields are present with defaults
         stats_response = {
             "total_violations": filter_stats.get("total_filtered", 0),
@@ -648,6 +673,7 @@ async def get_guild_stats_api(guild_id: int):
             "cache_hit_rate": performance_stats.get("cache_hit_rate", "0%"),
             "avg_response_time": performance_stats.get("avg_query_time_ms", 0),
             "days_analyzed": filter_stats.get("days_analyzed", 7),  # ✅ ADD MISSING FIELD
+            "filter_stages": filter_stages,
             # Add action breakdown if available
             "action_breakdown": filter_stats.get("action_breakdown", {
                 "delete": 0,
@@ -730,11 +756,8 @@ async def test_filter(guild_id: int):
         if guild_id not in guild_filters:
             return jsonify(success=False, error="Filter not initialised"), 400
 
-        result = await guild_filters[guild_id].contains_swear_word(message)
-        if isinstance(result, tuple):
-            would_block, blocked = result
-        else:
-            would_block, blocked = result, []
+        # Synchronous core: this handler runs outside the bot's event loop
+        would_block, blocked = guild_filters[guild_id].check(message)
 
         return jsonify(
             success=True,
@@ -0,0 +1,83 @@
+"""
+Microbenchmarks for the edit-distance kernels in swear_filter_updated.
+
+Compares the previous row-by-row DP (_levenshtein_dp) with the bit-parallel
+levenshtein_distance and the batch bounded_edit_distances API on chat-like
+tokens. Run from the backend directory:
+
+    python -m benchmarks.edit_distance [--pairs 20000] [--seed 1]
+"""
+import argparse
+import random
+import string
+import time
+
+from swear_filter_updated import _levenshtein_dp, bounded_edit_distances, levenshtein_distance
+
+SWEARS = ["fuck", "shit", "damn", "hell", "ass", "bitch", "cunt", "dick", "piss", "bastard",
+          "slut", "whore", "twat", "wank", "prick", "crap", "bollocks", "bugger", "arse", "douche"]
+
+
+def _random_word(rng: random.Random, low: int, high: int) -> str:
+    return ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(low, high)))
+
+
+def _mutate(rng: random.Random, word: str) -> str:
+    """Apply up to two random edits, the case the bypass check is looking for."""
+    for _ in range(rng.randint(0, 2)):
+        i = rng.randrange(len(word) + 1)
+        op = rng.randrange(3)
+        c = rng.choice(string.ascii_lowercase)
+        if op == 0 and i < len(word):
+            word = word[:i] + c + word[i + 1:]
+        elif op == 1 and i < len(word) and len(word) > 1:
+            word = word[:i] + word[i + 1:]
+        else:
+            word = word[:i] + c + word[i:]
+    return word
+
+
+def _time(label: str, fn, ops: int, baseline: float = None) -> float:
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    per_op = elapsed / ops * 1e9
+    speedup = f"  ({baseline / elapsed:.2f}x)" if baseline else ""
+    print(f"{label:<44} {per_op:>9.0f} ns/op{speedup}")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pairs", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    tokens = [_mutate(rng, rng.choice(SWEARS)) if rng.random() < 0.3 else _random_word(rng, 3, 10)
+              for _ in range(args.pairs)]
+    targets = [rng.choice(SWEARS) for _ in range(args.pairs)]
+    pairs = list(zip(tokens, targets))
+
+    # Both kernels must agree on which pairs are within distance 2
+    for a, b in pairs:
+        assert (levenshtein_distance(a, b, 2) <= 2) == (_levenshtein_dp(a, b, 2) <= 2), (a, b)
+
+    print(f"{len(pairs):,} token/swear pairs, max_distance=2")
+    base = _time("_levenshtein_dp (previous)", lambda: [_levenshtein_dp(a, b, 2) for a, b in pairs], len(pairs))
+    _time("levenshtein_distance (bit-parallel)", lambda: [levenshtein_distance(a, b, 2) for a, b in pairs],
+          len(pairs), base)
+
+    batch_tokens = tokens[:max(1, args.pairs // len(SWEARS))]
+    ops = len(batch_tokens) * len(SWEARS)
+    print(f"\n{len(batch_tokens):,} tokens x {len(SWEARS)} swears")
+    base = _time("_levenshtein_dp loop", lambda: [[_levenshtein_dp(t, s, 2) for s in SWEARS] for t in batch_tokens],
+                 ops)
+    _time("levenshtein_distance loop", lambda: [[levenshtein_distance(t, s, 2) for s in SWEARS]
+                                                for t in batch_tokens], ops, base)
+    _time("bounded_edit_distances batch", lambda: [bounded_edit_distances(t, SWEARS, 2) for t in batch_tokens],
+          ops, base)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""
+End-to-end benchmark for SwearFilter over generated chat corpora.
+
+Every corpus (clean chat, leetspeak, stretched words, spaced letters, Unicode
+confusables, max-length messages) is run against word lists of 10, 100 and
+1,000 entries. Each run reports p50/p99 latency, throughput and peak traced
+memory. Corpora and word lists come from a seeded RNG, so two commits
+benchmarked with the same arguments see identical input. Results are written
+as JSON; pass an earlier file to --compare to print the change per run.
+Run from the backend directory:
+
+    python -m benchmarks.filter_engine [--messages 500] [--sizes 10,100,1000]
+        [--corpora clean,leet] [--seed 1] [--cache] [--output PATH] [--compare PATH]
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+from swear_filter_updated import COMBINED_SUBSTITUTIONS, SwearFilter, VerdictCache, get_shared_safe_words
+
+# Real swears first; larger lists are padded with generated pseudo-words
+SWEARS = ["fuck", "shit", "damn", "hell", "ass", "bitch", "cunt", "dick", "piss", "bastard",
+          "slut", "whore", "twat", "wank", "prick", "crap", "bollocks", "bugger", "arse", "douche"]
+
+CHAT_WORDS = ["hey", "what", "is", "up", "the", "game", "last", "night", "was", "great", "lol",
+              "anyone", "want", "to", "play", "later", "i", "think", "so", "that", "classic",
+              "assessment", "pass", "hello", "well", "shell", "grass", "thanks", "for", "help",
+              "brb", "dinner", "see", "you", "tomorrow", "nice", "build", "check", "this", "out",
+              "message", "server", "channel", "music", "stream", "cool", "ok", "sure", "maybe"]
+
+# Discord's message limit for Nitro accounts
+MAX_MESSAGE_LENGTH = 4000
+
+DEFAULT_SIZES = (10, 100, 1000)
+
+
+# ==================== INPUT GENERATION ====================
+
+def make_word_list(size: int, seed: int) -> List[str]:
+    """size distinct entries: the real swears, then pronounceable pseudo-words."""
+    rng = random.Random(f"{seed}:words:{size}")
+    words = list(dict.fromkeys(SWEARS[:size]))
+    seen = set(words)
+    consonants, vowels = "bcdfghjklmnprstvwz", "aeiou"
+    while len(words) < size:
+        word = ''.join(rng.choice(consonants) + rng.choice(vowels) for _ in range(rng.randint(2, 4)))
+        word = word[:rng.randint(4, len(word))]
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+    return words
+
+
+def _chat(rng: random.Random, low: int = 4, high: int = 12) -> List[str]:
+    return [rng.choice(CHAT_WORDS) for _ in range(rng.randint(low, high))]
+
+
+def _with_swear(rng: random.Random, swears: List[str], disguise: Callable[[str], str]) -> str:
+    words = _chat(rng)
+    words.insert(rng.randrange(len(words) + 1), disguise(rng.choice(swears)))
+    return ' '.join(words)
+
+
+def _variants(ascii_only: bool) -> Dict[str, List[str]]:
+    return {
+        letter: [v for v in forms if v != letter and v.isascii() == ascii_only and len(v) == 1]
+        for letter, forms in COMBINED_SUBSTITUTIONS.items() if len(letter) == 1 and letter.islower()
+    }
+
+
+LEET_FORMS = _variants(ascii_only=True)
+CONFUSABLE_FORMS = _variants(ascii_only=False)
+
+
+def _substitute(rng: random.Random, word: str, forms: Dict[str, List[str]]) -> str:
+    return ''.join(rng.choice(forms[c]) if forms.get(c) and rng.random() < 0.5 else c for c in word)
+
+
+def _stretch(rng: random.Random, word: str) -> str:
+    return ''.join(c * rng.randint(1, 6) for c in word)
+
+
+def _space(rng: random.Random, word: str) -> str:
+    return rng.choice([' ', '.', '-', ' . ']).join(word)
+
+
+def _max_length(rng: random.Random, swears: List[str]) -> str:
+    parts = []
+    length = 0
+    while length < MAX_MESSAGE_LENGTH:
+        part = _with_swear(rng, swears, lambda w: _substitute(rng, w, LEET_FORMS)) \
+            if rng.random() < 0.1 else ' '.join(_chat(rng))
+        parts.append(part)
+        length += len(part) + 1
+    return ' '.join(parts)[:MAX_MESSAGE_LENGTH]
+
+
+CORPORA: Dict[str, Callable[[random.Random, List[str]], str]] = {
+    'clean': lambda rng, swears: ' '.join(_chat(rng)),
+    'leet': lambda rng, swears: _with_swear(rng, swears, lambda w: _substitute(rng, w, LEET_FORMS)),
+    'stretched': lambda rng, swears: _with_swear(rng, swears, lambda w: _stretch(rng, w)),
+    'spaced': lambda rng, swears: _with_swear(rng, swears, lambda w: _space(rng, w)),
+    'confusables': lambda rng, swears: _with_swear(rng, swears, lambda w: _substitute(rng, w, CONFUSABLE_FORMS)),
+    'max_length': _max_length,
+}
+
+
+def make_corpus(name: str, swears: List[str], count: int, seed: int) -> List[str]:
+    # Seeded per corpus so adding a corpus does not change the others
+    rng = random.Random(f"{seed}:{name}:{len(swears)}")
+    return [CORPORA[name](rng, swears) for _ in range(count)]
+
+
+# ==================== MEASUREMENT ====================
+
+def _percentile(sorted_values: List[int], fraction: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def _build_filter(swears: List[str], cache: bool) -> SwearFilter:
+    # Unbounded: a wall-clock budget would make verdicts depend on machine load
+    swear_filter = SwearFilter(set(swears), scan_budget_us=None)
+    if not cache:
+        # A zero budget stores nothing, so every message runs the full pipeline
+        swear_filter.verdict_cache = VerdictCache(max_bytes=0)
+    return swear_filter
+
+
+def run_one(swears: List[str], corpus: str, messages: List[str], cache: bool) -> Dict[str, object]:
+    start = time.perf_counter()
+    swear_filter = _build_filter(swears, cache)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    for message in messages[:20]:  # Warm regex and memo paths
+        swear_filter.check(message)
+    if not cache:
+        swear_filter.token_memo.clear()
+
+    latencies = []
+    flagged = 0
+    clock = time.perf_counter_ns
+    run_start = clock()
+    for message in messages:
+        began = clock()
+        contains_swear, _ = swear_filter.check(message)
+        latencies.append(clock() - began)
+        flagged += contains_swear
+    elapsed = (clock() - run_start) / 1e9
+    latencies.sort()
+
+    # Separate pass: tracing allocations would distort the timings above
+    tracemalloc.start()
+    traced_filter = _build_filter(swears, cache)
+    for message in messages:
+        traced_filter.check(message)
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    total_bytes = sum(len(message.encode('utf-8')) for message in messages)
+    return {
+        'words': len(swears),
+        'corpus': corpus,
+        'messages': len(messages),
+        'flagged': flagged,
+        'build_ms': round(build_ms, 3),
+        'p50_us': round(_percentile(latencies, 0.50) / 1000, 2),
+        'p99_us': round(_percentile(latencies, 0.99) / 1000, 2),
+        'mean_us': round(sum(latencies) / len(latencies) / 1000, 2),
+        'messages_per_s': round(len(messages) / elapsed, 1),
+        'mb_per_s': round(total_bytes / elapsed / 1e6, 3),
+        'peak_memory_bytes': peak_bytes,
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+# ==================== REPORTING ====================
+
+def _print_row(result: Dict[str, object], previous: Dict[str, object] = None):
+    change = ""
+    if previous:
+        delta = (result['p50_us'] - previous['p50_us']) / previous['p50_us'] * 100 if previous['p50_us'] else 0
+        change = f"  p50 {delta:+6.1f}% vs {previous['p50_us']:.1f}"
+    print(f"{result['words']:>5} {result['corpus']:<12} {result['p50_us']:>9.1f} {result['p99_us']:>9.1f} "
+          f"{result['messages_per_s']:>10,.0f} {result['mb_per_s']:>8.2f} "
+          f"{result['peak_memory_bytes'] / 1024:>9,.0f}{change}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=500, help="messages per corpus")
+    parser.add_argument("--sizes", default=','.join(map(str, DEFAULT_SIZES)), help="word-list sizes")
+    parser.add_argument("--corpora", default=','.join(CORPORA), help="corpora to run")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--cache", action="store_true", help="keep the verdict cache enabled")
+    parser.add_argument("--output", help="JSON results path (default benchmarks/results/filter_engine_<commit>.json)")
+    parser.add_argument("--compare", help="earlier results JSON to diff against")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    corpora = [name.strip() for name in args.corpora.split(',')]
+    unknown = set(corpora) - set(CORPORA)
+    if unknown:
+        parser.error(f"unknown corpora: {', '.join(sorted(unknown))}")
+
+    logging.getLogger('swear_filter_updated').setLevel(logging.WARNING)
+    get_shared_safe_words()  # Loaded once per process; not part of any run
+
+    previous = {}
+    if args.compare:
+        with open(args.compare) as f:
+            previous = {(r['words'], r['corpus']): r for r in json.load(f)['results']}
+
+    commit = _git_commit()
+    print(f"commit {commit}, {args.messages} messages per corpus, cache {'on' if args.cache else 'off'}")
+    print(f"{'words':>5} {'corpus':<12} {'p50 µs':>9} {'p99 µs':>9} {'msgs/s':>10} {'MB/s':>8} {'peak KiB':>9}")
+
+    results = []
+    for size in sizes:
+        swears = make_word_list(size, args.seed)
+        for corpus in corpora:
+            messages = make_corpus(corpus, swears, args.messages, args.seed)
+            result = run_one(swears, corpus, messages, args.cache)
+            results.append(result)
+            _print_row(result, previous.get((size, corpus)))
+
+    output = args.output or os.path.join(os.path.dirname(os.path.abspath(__file__)), "results",
+                                         f"filter_engine_{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({
+            'meta': {
+                'commit': commit,
+                'timestamp': datetime.now(timezone.utc).isoformat(),
+                'python': sys.version.split()[0],
+                'platform': platform.platform(),
+                'seed': args.seed,
+                'messages': args.messages,
+                'cache': args.cache,
+            },
+            'results': results,
+        }, f, indent=2)
+    print(f"\nWrote {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Differential check of the clean-message prefilter against the full scan.
+
+The prefilter lets clean messages skip the whole pipeline, so it must never
+pass a message the full scan would flag. This generates chat-like messages
+from dictionary words, swears and near-swears with random edits (case,
+punctuation, typos, doubled letters, spacing) and checks every message the
+prefilter passes with SwearFilter._scan. Re-run it after changing the
+prefilter, the word lists or the normalization tables. Exits with status 1
+on any false negative. Run from the backend directory:
+
+    python -m benchmarks.prefilter_soundness [--messages 30000] [--sizes 10,100,1000]
+        [--seed 1] [--show 10]
+"""
+import argparse
+import logging
+import random
+import string
+import sys
+from typing import List
+
+from benchmarks.filter_engine import CHAT_WORDS, make_corpus, make_word_list
+from swear_filter_updated import SwearFilter, TokenizedMessage, get_shared_safe_words
+
+# Tokens that sit right at the prefilter's edge: spaced letters, multi-character
+# variants, doubled letters and punctuation the plain-text gate still admits
+EDGE_TOKENS = ["f", "u", "c", "k", "sh", "it", "uu", "vv", "v.v", "ll", "ses", "savvy", "suss",
+               "class", "pass", "hello", "'", "-", "...", "?!"]
+
+# Dictionary words sampled into each vocabulary
+DICTIONARY_SAMPLE = 3000
+
+
+def _near_swears(rng: random.Random, swears: List[str]) -> List[str]:
+    """Swears with an affix, a doubled letter or one substituted letter."""
+    forms = []
+    for swear in swears:
+        i = rng.randrange(len(swear))
+        forms.extend([swear + rng.choice(["s", "ed", "er", "ing", "y"]), rng.choice(["un", "re"]) + swear,
+                      swear[:i] + swear[i] + swear[i:],
+                      swear[:i] + rng.choice(string.ascii_lowercase) + swear[i + 1:]])
+    return forms
+
+
+def _mutate(rng: random.Random, word: str) -> str:
+    roll = rng.random()
+    if roll < 0.10:
+        return word.upper()
+    if roll < 0.20:
+        return word + rng.choice(".,?'\"-")
+    if roll < 0.25 and len(word) > 2:
+        i = rng.randrange(len(word))
+        return word[:i] + rng.choice(string.ascii_lowercase) + word[i + 1:]
+    if roll < 0.30 and len(word) > 2:
+        i = rng.randrange(len(word))
+        return word[:i] + word[i + 1:]
+    if roll < 0.33:
+        return word + word[-1]
+    return word
+
+
+def make_messages(rng: random.Random, vocabulary: List[str], count: int) -> List[str]:
+    messages = []
+    for _ in range(count):
+        words = [_mutate(rng, rng.choice(vocabulary)) for _ in range(rng.randint(1, 8))]
+        messages.append(rng.choice([' ', '  ', '\n']).join(words))
+    return messages
+
+
+def check_soundness(swear_filter: SwearFilter, messages: List[str], show: int) -> int:
+    """Print the prefilter's pass rate for messages; returns the number of false negatives."""
+    passed = false_negatives = 0
+    for message in messages:
+        if not swear_filter._prefilter_is_clean(TokenizedMessage(message)):
+            continue
+        passed += 1
+        result = swear_filter._scan(message)
+        if result.contains_swear:
+            false_negatives += 1
+            if false_negatives <= show:
+                print(f"  FALSE NEGATIVE {message!r} -> {result.blocked_words}")
+    print(f"{len(swear_filter.swear_words):>5} words  {len(messages):>8,} messages  "
+          f"{passed:>8,} passed by the prefilter  {false_negatives} false negatives")
+    return false_negatives
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=30000, help="generated messages per word list")
+    parser.add_argument("--sizes", default="10,100,1000", help="word-list sizes")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--show", type=int, default=10, metavar="N", help="print up to N false negatives")
+    args = parser.parse_args()
+
+    logging.getLogger('swear_filter_updated').setLevel(logging.WARNING)
+    dictionary = list(get_shared_safe_words())
+
+    failures = 0
+    for size in (int(size) for size in args.sizes.split(',')):
+        rng = random.Random(f"{args.seed}:soundness:{size}")
+        swears = make_word_list(size, args.seed)
+        vocabulary = (CHAT_WORDS + EDGE_TOKENS + swears + _near_swears(rng, swears)
+                      + rng.sample(dictionary, min(DICTIONARY_SAMPLE, len(dictionary))))
+        messages = make_messages(rng, vocabulary, args.messages)
+        # The benchmark corpora too, so disguised swears are covered
+        messages += [message for corpus in ('clean', 'leet', 'stretched', 'spaced')
+                     for message in make_corpus(corpus, swears, args.messages // 20, args.seed)]
+        # Unbounded, so a degraded scan can never hide a hit
+        swear_filter = SwearFilter(set(swears), scan_budget_us=None)
+        failures += check_soundness(swear_filter, messages, args.show)
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
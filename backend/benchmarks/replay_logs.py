@@ -0,0 +1,261 @@
+"""
+Replay an exported filter_logs dump through SwearFilter, off Discord.
+
+Streams a CSV or NDJSON export of the filter_logs table, checks every
+message_content in parallel worker processes and reports throughput plus how
+the verdicts agree with the blocked_words each row was logged with. Rows are
+read lazily and only a bounded number of chunks is in flight, so dumps of any
+size replay in constant memory. Run from the backend directory:
+
+    python -m benchmarks.replay_logs DUMP [--words FILE] [--whitelist FILE]
+        [--workers N] [--chunk-size 256] [--guild ID] [--limit N]
+        [--show-disagreements 10] [--json PATH]
+
+Without --words, the word list is every word that appears in the dump's
+blocked_words (this takes one extra pass, so DUMP must be a file, not '-').
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from swear_filter_updated import SwearFilter, get_shared_safe_words
+
+# (message_content, logged blocked_words)
+Row = Tuple[str, List[str]]
+
+# Chunks queued per worker; bounds memory while keeping workers busy
+IN_FLIGHT_PER_WORKER = 4
+
+
+# ==================== DUMP READING ====================
+
+def parse_blocked_words(value) -> List[str]:
+    """blocked_words as exported: a JSON list, a Postgres array literal '{a,"b c"}' or 'a,b'."""
+    if value is None:
+        return []
+    if isinstance(value, list):
+        words = value
+    else:
+        value = value.strip()
+        if value.startswith('['):
+            words = json.loads(value)
+        else:
+            if value.startswith('{') and value.endswith('}'):
+                value = value[1:-1]
+            words = next(csv.reader([value], skipinitialspace=True), []) if value else []
+    return [word.lower().strip() for word in words if word and word.strip()]
+
+
+def read_dump(path: str, fmt: str = None, guild_id: str = None) -> Iterator[Row]:
+    """Yield (message_content, blocked_words) rows from a CSV or NDJSON dump ('-' is stdin)."""
+    if fmt is None:
+        fmt = 'csv' if path.lower().endswith('.csv') else 'ndjson'
+    handle = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+    try:
+        if fmt == 'csv':
+            records: Iterable[Dict[str, object]] = csv.DictReader(handle)
+        else:
+            records = (json.loads(line) for line in handle if line.strip())
+        for record in records:
+            if guild_id is not None and str(record.get('guild_id')) != guild_id:
+                continue
+            content = record.get('message_content')
+            if content:
+                yield content, parse_blocked_words(record.get('blocked_words'))
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+
+
+def read_word_file(path: str) -> List[str]:
+    """One word per line, or a JSON list."""
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    if text.lstrip().startswith('['):
+        return [word.lower().strip() for word in json.loads(text)]
+    return [line.lower().strip() for line in text.splitlines() if line.strip() and not line.startswith('#')]
+
+
+def _chunks(rows: Iterable[Row], size: int) -> Iterator[List[Row]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# ==================== WORKER SIDE ====================
+
+_worker_filter: Optional[SwearFilter] = None
+
+def _init_worker(swear_words: List[str], whitelist_words: List[str]):
+    global _worker_filter
+    logging.getLogger('swear_filter_updated').setLevel(logging.WARNING)
+    get_shared_safe_words()
+    # Unbounded: a wall-clock budget would make verdicts depend on machine load
+    _worker_filter = SwearFilter(set(swear_words), whitelist_words=whitelist_words, scan_budget_us=None)
+
+
+def _replay_chunk(messages: List[str]) -> Tuple[List[Tuple[bool, List[str]]], float]:
+    """Verdicts for one chunk plus the CPU seconds the worker spent on it."""
+    start = time.process_time()
+    verdicts = _worker_filter.check_many(messages)
+    return verdicts, time.process_time() - start
+
+
+def replay(rows: Iterable[Row], swear_words: List[str], whitelist_words: List[str],
+           workers: int, chunk_size: int) -> Iterator[Tuple[Row, Tuple[bool, List[str]], float]]:
+    """Yield (row, verdict, chunk_cpu_share) in input order, keeping a bounded window in flight."""
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(swear_words, whitelist_words)) as executor:
+        pending = deque()
+        chunks = _chunks(rows, chunk_size)
+        for chunk in chunks:
+            pending.append((chunk, executor.submit(_replay_chunk, [message for message, _ in chunk])))
+            if len(pending) >= workers * IN_FLIGHT_PER_WORKER:
+                yield from _drain(pending.popleft())
+        while pending:
+            yield from _drain(pending.popleft())
+
+
+def _drain(item) -> Iterator[Tuple[Row, Tuple[bool, List[str]], float]]:
+    chunk, future = item
+    verdicts, cpu_seconds = future.result()
+    for row, verdict in zip(chunk, verdicts):
+        yield row, verdict, cpu_seconds / len(chunk)
+
+
+# ==================== REPORT ====================
+
+class ReplayReport:
+    """Throughput and agreement with the logged verdicts."""
+
+    def __init__(self):
+        self.rows = 0
+        self.bytes = 0
+        self.cpu_seconds = 0.0
+        self.both_flagged = 0
+        self.only_logged = 0      # Logged as a violation, not flagged now (recall loss)
+        self.only_replayed = 0    # Flagged now, logged clean
+        self.neither = 0
+        self.exact_words = 0      # Same set of blocked words
+        self.missed_words: Counter = Counter()
+        self.new_words: Counter = Counter()
+        self.disagreements: List[Dict[str, object]] = []
+
+    def add(self, row: Row, verdict: Tuple[bool, List[str]], cpu_seconds: float, keep_examples: int):
+        message, logged_words = row
+        flagged, replayed_words = verdict
+        logged, replayed = set(logged_words), set(replayed_words)
+        self.rows += 1
+        self.bytes += len(message.encode('utf-8', 'surrogatepass'))
+        self.cpu_seconds += cpu_seconds
+
+        if logged and flagged:
+            self.both_flagged += 1
+        elif logged:
+            self.only_logged += 1
+        elif flagged:
+            self.only_replayed += 1
+        else:
+            self.neither += 1
+        if logged == replayed:
+            self.exact_words += 1
+        elif len(self.disagreements) < keep_examples:
+            self.disagreements.append({'message': message[:200], 'logged': sorted(logged),
+                                       'replayed': sorted(replayed)})
+        self.missed_words.update(logged - replayed)
+        self.new_words.update(replayed - logged)
+
+    def summary(self, elapsed: float, workers: int) -> Dict[str, object]:
+        logged_total = self.both_flagged + self.only_logged
+        return {
+            'rows': self.rows,
+            'workers': workers,
+            'elapsed_s': round(elapsed, 3),
+            'rows_per_s': round(self.rows / elapsed, 1) if elapsed else 0.0,
+            'mb_per_s': round(self.bytes / elapsed / 1e6, 3) if elapsed else 0.0,
+            'cpu_us_per_row': round(self.cpu_seconds / self.rows * 1e6, 2) if self.rows else 0.0,
+            'verdict_agreement': round((self.both_flagged + self.neither) / self.rows, 4) if self.rows else 0.0,
+            'recall': round(self.both_flagged / logged_total, 4) if logged_total else None,
+            'word_agreement': round(self.exact_words / self.rows, 4) if self.rows else 0.0,
+            'confusion': {'both_flagged': self.both_flagged, 'only_logged': self.only_logged,
+                          'only_replayed': self.only_replayed, 'neither': self.neither},
+            'top_missed_words': self.missed_words.most_common(10),
+            'top_new_words': self.new_words.most_common(10),
+            'disagreements': self.disagreements,
+        }
+
+
+def _print_summary(summary: Dict[str, object]):
+    confusion = summary['confusion']
+    recall = f"{summary['recall']:.2%}" if summary['recall'] is not None else "n/a"
+    print(f"rows                {summary['rows']:,}  ({summary['workers']} workers, {summary['elapsed_s']:.2f}s)")
+    print(f"throughput          {summary['rows_per_s']:,.0f} rows/s, {summary['mb_per_s']:.2f} MB/s, "
+          f"{summary['cpu_us_per_row']:.1f} µs CPU/row")
+    print(f"verdict agreement   {summary['verdict_agreement']:.2%}  (recall vs logged {recall})")
+    print(f"word agreement      {summary['word_agreement']:.2%}")
+    print(f"confusion           both={confusion['both_flagged']:,} only_logged={confusion['only_logged']:,} "
+          f"only_replayed={confusion['only_replayed']:,} neither={confusion['neither']:,}")
+    if summary['top_missed_words']:
+        print("missed words        " + ', '.join(f"{w} ({n})" for w, n in summary['top_missed_words']))
+    if summary['top_new_words']:
+        print("new words           " + ', '.join(f"{w} ({n})" for w, n in summary['top_new_words']))
+    for example in summary['disagreements']:
+        print(f"  {example['logged']} -> {example['replayed']}: {example['message']!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("dump", help="filter_logs export (.csv or NDJSON; '-' reads NDJSON from stdin)")
+    parser.add_argument("--format", choices=("csv", "ndjson"), help="override format detection")
+    parser.add_argument("--words", help="swear list (one per line or JSON list); default: words in the dump")
+    parser.add_argument("--whitelist", help="whitelist words (one per line or JSON list)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--guild", help="only replay rows from this guild_id")
+    parser.add_argument("--limit", type=int, help="stop after this many rows")
+    parser.add_argument("--show-disagreements", type=int, default=0, metavar="N",
+                        help="print up to N rows whose blocked words differ")
+    parser.add_argument("--json", help="also write the report to this path")
+    args = parser.parse_args()
+
+    if args.words:
+        swear_words = read_word_file(args.words)
+    elif args.dump == '-':
+        parser.error("--words is required when reading from stdin")
+    else:
+        swear_words = sorted({word for _, words in read_dump(args.dump, args.format, args.guild) for word in words})
+    whitelist_words = read_word_file(args.whitelist) if args.whitelist else []
+    if not swear_words:
+        parser.error("no swear words: pass --words or a dump with blocked_words")
+
+    rows = read_dump(args.dump, args.format, args.guild)
+    if args.limit:
+        rows = (row for _, row in zip(range(args.limit), rows))
+
+    print(f"Replaying {args.dump} against {len(swear_words)} words", file=sys.stderr)
+    report = ReplayReport()
+    start = time.perf_counter()
+    for row, verdict, cpu_seconds in replay(rows, swear_words, whitelist_words, args.workers, args.chunk_size):
+        report.add(row, verdict, cpu_seconds, args.show_disagreements)
+    summary = report.summary(time.perf_counter() - start, args.workers)
+
+    _print_summary(summary)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
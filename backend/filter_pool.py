@@ -0,0 +1,146 @@
+"""
+Optional worker-process pool for filtering long or expensive messages.
+
+Normalizing a 4,000-character obfuscated message can hold the discord.py
+event loop long enough to delay gateway heartbeats and every other guild's
+messages. FilterPool runs such messages in worker processes instead. Each
+worker loads the shared safe-word dictionary once and keeps pre-built
+filters keyed by rule-set, so a guild's filter is built at most once per
+worker. Every task carries the guild's current rule-set, which means rule
+changes reach the workers with the next message; no separate sync is needed.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import FrozenSet, Iterable, List, Tuple
+
+from swear_filter_updated import (ContextRules, GuildFilter, ScanResult, StageStats, SwearFilter,
+                                  get_shared_safe_words)
+
+logger = logging.getLogger(__name__)
+
+RuleSet = Tuple[FrozenSet[str], FrozenSet[str], ContextRules]
+
+# Messages at or above this UTF-8 size go to the pool. Non-ASCII characters
+# count 2-4 bytes each, which matches the extra normalization work they cause.
+DEFAULT_MIN_BYTES = 1000
+
+# Filters kept per worker; least recently used rule-sets are dropped first
+WORKER_FILTER_LIMIT = 64
+
+# Delay before rebuilding a broken pool, doubled while rebuilt pools keep breaking
+RESTART_BACKOFF_S = 1.0
+MAX_RESTART_BACKOFF_S = 300.0
+
+# ==================== WORKER SIDE ====================
+
+_worker_filters: 'OrderedDict[RuleSet, SwearFilter]' = OrderedDict()
+
+def _init_worker(rule_sets: List[RuleSet]):
+    """Load the dictionary and pre-build the filters known at pool start."""
+    logging.getLogger('swear_filter_updated').setLevel(logging.WARNING)
+    get_shared_safe_words()
+    for rules in rule_sets:
+        _worker_filter(rules)
+
+def _worker_filter(rules: RuleSet) -> SwearFilter:
+    swear_filter = _worker_filters.get(rules)
+    if swear_filter is None:
+        swear_words, whitelist_words, context_rules = rules
+        swear_filter = SwearFilter(set(swear_words), whitelist_words=whitelist_words,
+                                   context_rules=context_rules)
+        _worker_filters[rules] = swear_filter
+        if len(_worker_filters) > WORKER_FILTER_LIMIT:
+            _worker_filters.popitem(last=False)
+    else:
+        _worker_filters.move_to_end(rules)
+    return swear_filter
+
+def _check_in_worker(rules: RuleSet, message: str, budget_us: int) -> Tuple[ScanResult, StageStats]:
+    # The full result (with hit spans) goes back to the caller, so censoring needs no second scan.
+    # Offloaded messages are the slow ones, so every stage is timed and merged into the guild's stats.
+    stage_stats = StageStats(sample_every=1)
+    return _worker_filter(rules).scan(message, stage_stats, budget_us), stage_stats
+
+# ==================== EVENT-LOOP SIDE ====================
+
+class FilterPool:
+    """Process pool that checks messages against a guild filter's rule-set."""
+    
+    def __init__(self, workers: int, min_bytes: int = DEFAULT_MIN_BYTES,
+                 rule_sets: Iterable[RuleSet] = ()):
+        # Identical rule-sets (e.g. guilds on the default list) are warmed once
+        self._warm = list(dict.fromkeys(rule_sets))
+        self.workers = workers
+        self.min_bytes = min_bytes
+        self.offloaded = 0
+        self.failures = 0
+        self.restarts = 0
+        self._restart_backoff = RESTART_BACKOFF_S
+        self._restart_at = 0.0  # monotonic time before which a broken pool is not rebuilt
+        self.executor = self._start_executor()
+        logger.info(f"[FilterPool] Started {workers} workers ({len(self._warm)} rule-sets pre-built, "
+                    f"offloading messages >= {min_bytes} bytes)")
+    
+    def _start_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                   initargs=(self._warm,))
+    
+    def _restart(self, broken: ProcessPoolExecutor):
+        """Replace a broken executor, at most once per backoff period."""
+        now = time.monotonic()
+        if broken is not self.executor or now < self._restart_at:
+            return  # Already replaced by a concurrent check, or still backing off
+        broken.shutdown(wait=False, cancel_futures=True)
+        self.executor = self._start_executor()
+        self.restarts += 1
+        self._restart_at = now + self._restart_backoff
+        logger.warning(f"[FilterPool] Rebuilt worker pool (restart {self.restarts}); "
+                       f"next rebuild no sooner than {self._restart_backoff:.0f}s")
+        self._restart_backoff = min(self._restart_backoff * 2, MAX_RESTART_BACKOFF_S)
+    
+    def should_offload(self, message: str) -> bool:
+        # A character is at most 4 bytes, so short messages skip the encode
+        if len(message) * 4 < self.min_bytes:
+            return False
+        return len(message.encode('utf-8', 'surrogatepass')) >= self.min_bytes
+    
+    async def scan(self, swear_filter: GuildFilter, message: str) -> ScanResult:
+        """Same contract as GuildFilter.scan, evaluated in a worker."""
+        # Rules can change while the message is in the worker: the handle may be
+        # re-pointed, or the compiled filter edited in place (which clears its
+        # cache). Either way the worker's verdict must not be cached afterwards.
+        compiled = swear_filter.compiled
+        generation = compiled.verdict_cache.generation
+        rules = compiled.rule_set()  # Also syncs the filter, dropping stale cached verdicts
+        cached = compiled.verdict_cache.get(message)
+        if cached is not None:
+            swear_filter.query_count += 1
+            swear_filter.cache_hits += 1
+            return cached
+        
+        loop = asyncio.get_running_loop()
+        executor = self.executor
+        try:
+            result, stage_stats = await loop.run_in_executor(executor, _check_in_worker, rules, message,
+                                                             swear_filter.scan_budget_us or 0)
+        except BrokenProcessPool as e:
+            # A crashed worker poisons the executor; rebuild it and check this message locally
+            self.failures += 1
+            logger.error(f"[FilterPool] Worker pool broken, checking locally: {e}")
+            self._restart(executor)
+            return swear_filter.scan(message)
+        
+        self.offloaded += 1
+        self._restart_backoff = RESTART_BACKOFF_S  # The pool works again
+        swear_filter.query_count += 1
+        swear_filter.stage_stats.merge(stage_stats)
+        if not result.degraded and swear_filter.compiled is compiled:
+            compiled.verdict_cache.put(message, result, generation)
+        return result
+    
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
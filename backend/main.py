@@ -87,7 +87,8 @@ from socket_events import setup_socket_events  # ✅ ADD THIS IMPORT
 from database import initialize_database, get_database, DatabaseError
 
 # Import your existing swear filter (keeping your original)
-from swear_filter_updated import SwearFilter
+from swear_filter_updated import SCAN_BUDGET_US, GuildFilter, get_shared_safe_words, mask_spans
+from filter_pool import DEFAULT_MIN_BYTES, FilterPool
 from shared import guild_filters
 
 # Configure logging
@@ -106,6 +107,16 @@ SUPABASE_URL = os.getenv('SUPABASE_URL')
 SUPABASE_KEY = os.getenv('SUPABASE_KEY') 
 DISCORD_TOKEN = os.getenv('DISCORD_TOKEN')
 
+# Optional worker processes for long/obfuscated messages (0 = filter on the event loop)
+FILTER_POOL_WORKERS = int(os.getenv('FILTER_POOL_WORKERS', '0'))
+FILTER_POOL_MIN_BYTES = int(os.getenv('FILTER_POOL_MIN_BYTES', str(DEFAULT_MIN_BYTES)))
+filter_pool: Optional[FilterPool] = None
+
+# Webhooks used by the censor_repost action, one per channel
+REPOST_WEBHOOK_NAME = "Swear Filter Repost"
+DISCORD_MESSAGE_LIMIT = 2000  # Characters per message; masks and the name prefix can exceed it
+repost_webhooks: Dict[int, discord.Webhook] = {}
+
 # MODIFIED: Enhanced environment check
 if not all([SUPABASE_URL, SUPABASE_KEY, DISCORD_TOKEN]):
     logger.error("Missing required environment variables: DISCORD_TOKEN, SUPABASE_URL, SUPABASE_KEY")
@@ -157,7 +168,8 @@ class GuildSettingsCache:
                 'bypass_roles': guild_settings.get('bypass_roles', []),
                 'bypass_channels': guild_settings.get('bypass_channels', []),
                 'custom_words': guild_settings.get('custom_words', []),
-                'whitelist_words': guild_settings.get('whitelist_words', [])
+                'whitelist_words': guild_settings.get('whitelist_words', []),
+                'scan_budget_us': guild_settings.get('scan_budget_us') or SCAN_BUDGET_US  # NULL = default
             }
             
             
@@ -180,7 +192,8 @@ class GuildSettingsCache:
                 'bypass_roles': [],
                 'bypass_channels': [],
                 'custom_words': [],
-                'whitelist_words': []
+                'whitelist_words': [],
+                'scan_budget_us': SCAN_BUDGET_US
             }
         
         return guild_data            
@@ -274,6 +287,7 @@ cooldown_manager = CooldownManager()
 @bot.event
 async def on_ready():
     """Single, consolidated startup event handler with dashboard integration"""
+    global filter_pool
     bot.start_time = time.time()
 
     logger.info(f"🚀 {bot.user} is ready!")
@@ -288,6 +302,12 @@ async def on_ready():
         logger.error(f"❌ Database initialization failed: {e}")
         return
 
+    # Load the shared safe-word dictionary once, off the event loop
+    try:
+        await asyncio.to_thread(get_shared_safe_words)
+    except Exception as e:
+        logger.error(f"❌ Failed to load safe-word dictionary: {e}")
+
     # Initialize per-guild filters
     # In your on_ready event, find this section and REPLACE IT:
     for guild in bot.guilds:
@@ -298,16 +318,30 @@ async def on_ready():
                 guild_data = {}  # Use empty dict as fallback
                 
             custom = guild_data.get('custom_words', [])
+            whitelist = guild_data.get('whitelist_words', [])
             
-            # Initialize filter with proper dictionary loading
-            swear_filter = SwearFilter(set(custom))
+            # Guilds with identical word lists share one compiled filter; the
+            # optional scan_budget_us setting caps per-message filter CPU time
+            swear_filter = GuildFilter(custom, whitelist_words=whitelist,
+                                       scan_budget_us=guild_data.get('scan_budget_us', SCAN_BUDGET_US))
             guild_filters[guild.id] = swear_filter
             
             logger.info(f"✅ Initialized filter for {guild.name} ({len(custom)} custom words, {len(swear_filter.safe_words)} safe words)")
         except Exception as e:
             logger.error(f"❌ Error initializing filter for {guild.name}: {e}")
             # ✅ FALLBACK: Create empty filter if initialization fails
-            guild_filters[guild.id] = SwearFilter(set())
+            guild_filters[guild.id] = GuildFilter(())
+
+    # Start the filter worker pool with every guild's rule-set pre-built
+    if FILTER_POOL_WORKERS > 0 and filter_pool is None:
+        try:
+            filter_pool = FilterPool(
+                FILTER_POOL_WORKERS,
+                min_bytes=FILTER_POOL_MIN_BYTES,
+                rule_sets=[f.rule_set() for f in guild_filters.values()],
+            )
+        except Exception as e:
+            logger.error(f"❌ Failed to start filter worker pool: {e}")
 
     # Sync slash commands
     try:
@@ -414,6 +448,71 @@ async def send_enhanced_log_message(guild_id: int, user, channel, blocked_words:
         
     except Exception as e:
         logger.error(f"Failed to send log message: {e}")
+async def get_repost_webhook(channel) -> Optional[discord.Webhook]:
+    """Find or create the channel's repost webhook (cached); None without Manage Webhooks."""
+    webhook = repost_webhooks.get(channel.id)
+    if webhook:
+        return webhook
+    try:
+        webhook = discord.utils.get(await channel.webhooks(), name=REPOST_WEBHOOK_NAME)
+        if webhook is None:
+            webhook = await channel.create_webhook(name=REPOST_WEBHOOK_NAME)
+    except (discord.Forbidden, discord.HTTPException, AttributeError) as e:
+        logger.debug(f"No repost webhook for channel {channel.id}: {e}")
+        return None
+    repost_webhooks[channel.id] = webhook
+    return webhook
+
+def split_for_discord(text: str, limit: int = DISCORD_MESSAGE_LIMIT) -> List[str]:
+    """Split text into messages Discord accepts, breaking at whitespace where possible."""
+    chunks = []
+    while len(text) > limit:
+        cut = max(text.rfind(' ', 1, limit + 1), text.rfind('\n', 1, limit + 1))
+        if cut < limit // 2:  # No usable break (e.g. one long masked run)
+            cut = limit
+        chunks.append(text[:cut])
+        text = text[cut:].lstrip(' \n')
+    if text:
+        chunks.append(text)
+    return chunks
+
+async def repost_censored_message(message: discord.Message, spans: List[Tuple[int, int, str]]) -> bool:
+    """
+    Repost a message with its hits masked, under the author's name and avatar.
+    spans are the hit spans from the scan that flagged the message, so masking
+    never scans it again. Returns False if nothing could be posted.
+    """
+    censored = mask_spans(message.content, spans)
+    no_pings = discord.AllowedMentions.none()
+    chunks = split_for_discord(censored)
+    sent = 0
+    webhook = await get_repost_webhook(message.channel)
+    if webhook:
+        try:
+            for chunk in chunks:
+                await webhook.send(
+                    chunk,
+                    username=message.author.display_name,
+                    avatar_url=message.author.display_avatar.url,
+                    allowed_mentions=no_pings,
+                )
+                sent += 1
+            return True
+        except discord.NotFound:
+            repost_webhooks.pop(message.channel.id, None)  # Deleted by a moderator
+        except discord.HTTPException as e:
+            logger.warning(f"Webhook repost failed in channel {message.channel.id}: {e}")
+    # Without a webhook the author is named in the text; a partial webhook repost is finished as is
+    remaining = chunks[sent:] if sent else split_for_discord(f"**{message.author.display_name}:** {censored}")
+    try:
+        for chunk in remaining:
+            await message.channel.send(chunk, allowed_mentions=no_pings)
+            sent += 1
+        return True
+    except discord.HTTPException as e:
+        logger.warning(f"Repost failed in channel {message.channel.id}: {e}")
+        return sent > 0
+
 @bot.event
 async def on_message(message: discord.Message):
     """Enhanced message handler with WORKING timeout/kick system + real-time dashboard updates"""
@@ -451,7 +550,14 @@ async def on_message(message: discord.Message):
         return
 
     try:
-        is_profane, detected_words = await swear_filter.contains_swear_word(message.content)
+        # Long or heavily obfuscated messages are checked off the event loop when a pool is running.
+        # The full result is kept: its hit spans are what censor_repost masks.
+        if filter_pool and filter_pool.should_offload(message.content):
+            scan_result = await filter_pool.scan(swear_filter, message.content)
+        else:
+            await asyncio.sleep(0)  # Yield control before scanning
+            scan_result = swear_filter.scan(message.content)
+        is_profane, detected_words = scan_result.contains_swear, scan_result.blocked_words
         
         if not is_profane:
             return
@@ -462,29 +568,40 @@ async def on_message(message: discord.Message):
     # Get action configuration
     action_type = guild_data.get('action_type', 'delete_only')
 
+    # censor_repost posts the masked copy before deleting, so a failed repost falls back to the
+    # notification instead of losing the message silently. Without Manage Messages the delete
+    # would fail and leave the original next to the copy, so the repost is skipped.
+    reposted = False
+    if action_type == 'censor_repost' and message.channel.permissions_for(message.guild.me).manage_messages:
+        try:
+            reposted = await repost_censored_message(message, scan_result.spans)
+        except Exception as e:
+            logger.error(f"Censored repost failed in channel {message.channel.id}: {e}")
+
     try:
-        # STEP 1: Always delete the message first
+        # STEP 1: Delete the message
         await message.delete()
         
-        # STEP 2: Send deletion notification with user ping
-        embed = discord.Embed(
-            title="🚫 Message Deleted",
-            description=f"{message.author.mention}, your message contained inappropriate language and has been removed.",
-            color=0xff6b6b
-        )
-        embed.add_field(name="Detected Words", value=", ".join(detected_words), inline=False)
-        embed.add_field(name="Action", value=action_type.replace('_', ' ').title(), inline=True)
-        embed.set_footer(text="Please follow server rules to avoid further action.")
-        
-        # Send and auto-delete the notification
-        notification_msg = await message.channel.send(embed=embed, delete_after=15)
+        # STEP 2: Send a deletion notification with user ping, unless the message was reposted
+        if not reposted:
+            embed = discord.Embed(
+                title="🚫 Message Deleted",
+                description=f"{message.author.mention}, your message contained inappropriate language and has been removed.",
+                color=0xff6b6b
+            )
+            embed.add_field(name="Detected Words", value=", ".join(detected_words), inline=False)
+            embed.add_field(name="Action", value=action_type.replace('_', ' ').title(), inline=True)
+            embed.set_footer(text="Please follow server rules to avoid further action.")
+            
+            # Send and auto-delete the notification
+            notification_msg = await message.channel.send(embed=embed, delete_after=15)
         
-    except discord.Forbidden:
-        pass
+    except discord.Forbidden as e:
+        logger.warning(f"Missing permissions to delete or notify in channel {message.channel.id}: {e}")
     except discord.NotFound:
         pass  # Message already deleted
     except Exception as e:
-        pass
+        logger.error(f"Failed to delete flagged message in channel {message.channel.id}: {e}")
 
     # STEP 3: Handle timeout/kick escalation if configured
     if action_type in ['delete_timeout', 'delete_timeout_kick']:
@@ -1071,6 +1188,12 @@ async def swear_action(interaction: discord.Interaction):
                     description="Delete, timeout, then kick persistent offenders",
                     value="delete_timeout_kick",
                     emoji="👢"
+                ),
+                discord.SelectOption(
+                    label="Censor + Repost",
+                    description="Repost the message with swear words masked out",
+                    value="censor_repost",
+                    emoji="✏️"
                 )
             ]
         )
@@ -1105,6 +1228,29 @@ async def swear_action(interaction: discord.Interaction):
                     embed = discord.Embed(title="❌ Error", description="Failed to save settings.", color=0xff6b6b)
                     await select_interaction.response.edit_message(embed=embed, view=None)
                     
+            elif action_type == "censor_repost":
+                try:
+                    db = get_database()
+                    await db.update_guild_settings(interaction.guild.id, {
+                        'action_type': 'censor_repost'
+                    })
+                    await guild_cache.invalidate_guild(interaction.guild.id)
+                    
+                    embed = discord.Embed(
+                        title="✅ Action Set: Censor + Repost",
+                        description="Messages with swear words will be reposted with those words masked out.",
+                        color=0x4caf50
+                    )
+                    embed.add_field(name="Action", value="✏️ Repost Masked Message", inline=True)
+                    embed.add_field(name="Permission", value="Manage Webhooks (to repost as the author)", inline=True)
+                    
+                    await select_interaction.response.edit_message(embed=embed, view=None)
+                    
+                except Exception as e:
+                    logger.error(f"Error saving censor_repost action: {e}")
+                    embed = discord.Embed(title="❌ Error", description="Failed to save settings.", color=0xff6b6b)
+                    await select_interaction.response.edit_message(embed=embed, view=None)
+                    
             elif action_type == "delete_timeout":
                 # Show timeout configuration modal
                 class TimeoutConfigModal(discord.ui.Modal):
@@ -1268,6 +1414,12 @@ async def swear_action(interaction: discord.Interaction):
         inline=False
     )
     
+    embed.add_field(
+        name="✏️ Censor + Repost",
+        value="Reposts the message with swear words masked out",
+        inline=False
+    )
+    
     view = ActionTypeView()
     await interaction.response.send_message(embed=embed, view=view)
 
@@ -1618,7 +1770,7 @@ async def clear_words(interaction: discord.Interaction):
                     
                     # Update filter
                     if interaction.guild.id in guild_filters:
-                        guild_filters[interaction.guild.id] = SwearFilter(set())
+                        guild_filters[interaction.guild.id].set_words([])
                     
                     embed = discord.Embed(
                         title="✅ All Words Cleared",
@@ -1806,11 +1958,15 @@ async def add_word(interaction: discord.Interaction, words: str):
         
         # Update filter with new words
         if interaction.guild.id in guild_filters:
-            # Update the existing filter's word list
-            guild_filters[interaction.guild.id].swear_words.update(set(new_words))
+            # Edited in place if only this guild uses the compiled filter; otherwise the guild
+            # is moved to a filter for its new word list and the shared one is left alone
+            guild_filters[interaction.guild.id].add_words(new_words)
         else:
             # Create new filter with all custom words
-            guild_filters[interaction.guild.id] = SwearFilter(set(custom_words))
+            guild_filters[interaction.guild.id] = GuildFilter(
+                custom_words, whitelist_words=guild_data.get('whitelist_words', []),
+                scan_budget_us=guild_data.get('scan_budget_us', SCAN_BUDGET_US)
+            )
         
         embed = discord.Embed(
             title="✅ Words Added Successfully",
@@ -1894,9 +2050,10 @@ async def remove_word(interaction: discord.Interaction, words: str):
         await db.update_guild_settings(interaction.guild.id, {'custom_words': custom_words})
         await guild_cache.invalidate_guild(interaction.guild.id)
         
-        # Update filter by recreating with remaining words
+        # Edited in place if only this guild uses the compiled filter; otherwise the guild
+        # is moved to a filter for its remaining words and the shared one is left alone
         if interaction.guild.id in guild_filters:
-            guild_filters[interaction.guild.id] = SwearFilter(set(custom_words))
+            guild_filters[interaction.guild.id].remove_words(removed_words)
         
         embed = discord.Embed(
             title="✅ Words Removed Successfully",
@@ -2274,16 +2431,18 @@ async def test_swear(interaction: discord.Interaction, message: str):
         whitelist_words = guild_data.get('whitelist_words', [])
         
         if interaction.guild.id not in guild_filters:
-            guild_filters[interaction.guild.id] = SwearFilter(set(custom_words))
+            guild_filters[interaction.guild.id] = GuildFilter(
+                custom_words, whitelist_words=whitelist_words,
+                scan_budget_us=guild_data.get('scan_budget_us', SCAN_BUDGET_US)
+            )
         
         swear_filter = guild_filters[interaction.guild.id]
         
-        # Update filter with current words
-        swear_filter.swear_words = set(custom_words)
+        # Update filter with current words (only the differences are re-indexed)
+        swear_filter.set_words(custom_words)
         
         # Add whitelist words
-        if hasattr(swear_filter, 'safe_words'):
-            swear_filter.safe_words.update(set(whitelist_words))
+        swear_filter.add_whitelist_words(whitelist_words)
         
         # Test the message
         result = await swear_filter.contains_swear_word(message)
@@ -2517,6 +2676,25 @@ async def view_stats(interaction: discord.Interaction):
             inline=True
         )
         
+        # Per-stage filter timings (sampled) and hit counts since startup, plus verdict cache counters
+        swear_filter = guild_filters.get(interaction.guild.id)
+        if swear_filter and swear_filter.stage_stats.scans:
+            stage_stats = swear_filter.stage_stats.snapshot()
+            cache_stats = swear_filter.verdict_cache.stats()
+            stage_lines = [
+                f"`{stage:<11}` {stage_data['avg_us']:>8.1f}µs avg · {stage_data['time_share']:.0%} · **{stage_data['hits']:,}** hits"
+                for stage, stage_data in stage_stats['stages'].items()
+            ]
+            embed.add_field(
+                name="🔬 Filter Stages",
+                value="\n".join(stage_lines) + f"\n{stage_stats['scans']:,} scans, 1 in {stage_stats['sample_every']} timed, "
+                                                f"{stage_stats['degraded_scans']:,} over budget"
+                                                f"\nVerdict cache: **{cache_stats['hit_rate']:.1%}** hit rate "
+                                                f"({cache_stats['hits']:,} hits, {cache_stats['misses']:,} misses), "
+                                                f"{cache_stats['evictions']:,} evicted, {cache_stats['expirations']:,} expired",
+                inline=False
+            )
+        
         # Top blocked words
         if filter_stats['top_blocked_words']:
             top_words_text = "\n".join([
@@ -2714,6 +2892,9 @@ async def main():
         if cleanup_task.is_running():
             cleanup_task.cancel()
         
+        if filter_pool is not None:
+            filter_pool.shutdown()
+        
         try:
             db = get_database()
             await db.close()
@@ -1 +1 @@
-guild_filters = {}  # guild_id: SwearFilter
+guild_filters = {}  # guild_id: GuildFilter (compiled filters are shared between identical rule-sets)
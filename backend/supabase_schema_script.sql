@@ -39,6 +39,7 @@ CREATE TABLE guild_settings (
     bypass_channels TEXT[] NOT NULL DEFAULT '{}',
     custom_words TEXT[] NOT NULL DEFAULT '{}',
     whitelist_words TEXT[] NOT NULL DEFAULT '{}',
+    scan_budget_us INTEGER CHECK (scan_budget_us BETWEEN 1000 AND 1000000),  -- NULL = filter default
     created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
     updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
 );
@@ -84,6 +85,14 @@ CREATE TABLE performance_metrics (
     recorded_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
 );
 
+-- ================================================================
+-- MIGRATIONS
+-- Columns added after the first release. No-ops on a fresh install;
+-- run these statements on an existing database to bring it up to date.
+-- ================================================================
+
+ALTER TABLE guild_settings ADD COLUMN IF NOT EXISTS scan_budget_us INTEGER CHECK (scan_budget_us BETWEEN 1000 AND 1000000);
+
 -- ================================================================
 -- INDEXES FOR PERFORMANCE
 -- ================================================================
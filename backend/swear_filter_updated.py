@@ -1,11 +1,20 @@
 import re
+import string
 import asyncio
 import unicodedata
 import os
+import hashlib
 import logging
-from collections import defaultdict
-from itertools import product
-from typing import List, Dict, Set, Optional, Tuple
+import mmap
+import struct
+import sys
+import threading
+import weakref
+import zlib
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict, defaultdict
+from typing import Callable, FrozenSet, Iterable, List, Dict, NamedTuple, Set, Optional, Tuple
 import time
 
 # Set up proper logging instead of print statements
@@ -96,7 +105,8 @@ def build_normalization_map(substitutions: Dict[str, List[str]]) -> Dict[str, st
             # Handle single character variants only for translation table
             if len(var) == 1:
                 for form in {var, var.lower(), var.upper()}:
-                    if form not in norm_map:
+                    # Case mapping can widen a character ('ß'.upper() == 'SS'); keep single chars only
+                    if len(form) == 1 and form not in norm_map:
                         norm_map[form] = base.lower()
     return norm_map
 
@@ -128,21 +138,21 @@ HOMOGLYPHS = {
 }
 
 # Context-aware whitelist - ENHANCED for better accuracy
+# Rules are compiled once into a ContextWhitelist (see below); patterns of the
+# form \bword\w*\b and \bword\b become token prefix / exact-token lookups.
 CONTEXT_WHITELIST = {
     'ass': {
         'patterns': [
             r'\bclass\w*\b', r'\bpass\w*\b', r'\bgrass\w*\b', 
             r'\bmass\w*\b', r'\bassess\w*\b', r'\bassign\w*\b',
             r'\bassist\w*\b', r'\bassert\w*\b', r'\bassist\w*\b'
-        ],
-        'timeout': 1.0
+        ]
     },
     'hell': {
         'patterns': [
             r'\bhello\w*\b', r'\bshell\w*\b', r'\bwherein\b',
             r'\bmichelle\b', r'\bseychelles\b'
-        ],
-        'timeout': 1.0
+        ]
     }
 }
 # Add this method to your SwearFilter class:
@@ -171,6 +181,9 @@ SUFFIX_RULES = {
     'y': {'min_length': 4, 'exceptions': set(['my', 'by', 'try', 'dry', 'guy'])}
 }
 
+# Prefixes accepted in front of a swear (unfuck, reshit)
+INFLECTION_PREFIXES = ('re', 'un', 'de', 'in', 'pre', 'pro', 'anti', 'non')
+
 # Common safe words - PRESERVED
 COMMON_SAFE_WORDS = {
     "penistone", "lightwater", "cockburn", "mianus",
@@ -185,52 +198,165 @@ COMMON_SAFE_WORDS = {
 }
 
 # Short abbreviations that are swears - PRESERVED
-SHORT_SWEARS = {
+SHORT_SWEARS = frozenset({
     'fx', 'fk', 'sht', 'wtf', 'ffs', 'ngr', 'bch', 'cnt', 'dck',
     'fck', 'sh1', '5ht', 'vgn', 'prn', 'f4n', 'n1g', 'k3k', 'fku',
-    'sht', 'ass', 'bch', 'cnt', 'dck', 'fuk', 'fuc', 'sh1', 'fgs',
-    'ngr', 'wth', 'dmn', 'bch', 'cnt', 'dmn', 'fgs', 'ngr', 'prk',
-    'twt', 'vgn', 'prn', 'f4n', 'n1g', 'k3k', 'fku', 'sht'
-}
+    'ass', 'fuk', 'fuc', 'fgs', 'wth', 'dmn', 'prk', 'twt',
+})
+
+# Digits and symbols _check_short_swears ignores ('f@ck' -> 'fck'), and the short
+# swears that can still match once they are gone
+SHORT_SWEAR_STRIP_CHARS = '1378245609@#$+*'
+SHORT_SWEAR_STRIP_TABLE = str.maketrans('', '', SHORT_SWEAR_STRIP_CHARS)
+NORMALIZED_SHORT_SWEARS = frozenset(
+    word for word in SHORT_SWEARS if not any(char in SHORT_SWEAR_STRIP_CHARS for char in word)
+)
+
+# ==================== PRECOMPUTED NORMALIZATION TABLES ====================
+# Character-level steps are fused into str.translate tables so each is a single
+# C-level pass over the text instead of one Python pass per step.
+
+_HIDDEN_TABLE = str.maketrans({char: None for char in HIDDEN_SEPARATORS})
+_HOMOGLYPH_TABLE = str.maketrans(HOMOGLYPHS)
+
+# Hidden separators removed and homoglyphs mapped in one translate call
+PREPROCESS_TABLE = str.maketrans(
+    {**{char: None for char in HIDDEN_SEPARATORS}, **HOMOGLYPHS}
+)
+
+# Script tiers: each message is classified once and preprocessing runs only the
+# steps its tier can be changed by
+SCRIPT_ASCII = 'ascii'  # NFKC and PREPROCESS_TABLE leave it as it is
+SCRIPT_LATIN = 'latin'  # Latin letters NFKC leaves alone (accents): PREPROCESS_TABLE only
+SCRIPT_MIXED = 'mixed'  # Other scripts, compatibility forms, combining marks: everything
+
+_PREPROCESS_CHANGES_ASCII = any(code < 128 for code in PREPROCESS_TABLE)
+
+# Up to Latin Extended-B. No canonical composition pairs two characters from
+# this range (combining marks start at U+0300), so a string of them is as
+# NFKC-stable as each character is on its own.
+_NFKC_STABLE_LATIN = frozenset(
+    char for char in map(chr, range(0x250)) if unicodedata.normalize("NFKC", char) == char
+)
+
+def classify_script(text: str) -> str:
+    """The script tier of a message (SCRIPT_ASCII, SCRIPT_LATIN or SCRIPT_MIXED)."""
+    if text.isascii():
+        return SCRIPT_LATIN if _PREPROCESS_CHANGES_ASCII else SCRIPT_ASCII
+    if _NFKC_STABLE_LATIN.issuperset(text):
+        return SCRIPT_LATIN
+    return SCRIPT_MIXED
+
+# Everything normalize_to_base folds per character: hidden separators,
+# substitution variants and homoglyphs (substitutions win on conflicts)
+BASE_TABLE = str.maketrans({
+    **{char: None for char in HIDDEN_SEPARATORS},
+    **{char: base for char, base in HOMOGLYPHS.items() if char not in NORMALIZATION_MAP},
+    **NORMALIZATION_MAP,
+})
+
+def _build_multi_char_variants() -> Dict[str, str]:
+    """Multi-character variants ('|)', '()', 'vv', '><', ...) mapped to their base letter."""
+    variants: Dict[str, str] = {}
+    for base, forms in COMBINED_SUBSTITUTIONS.items():
+        for form in forms:
+            if len(form) > 1:
+                for variant in (form, form.lower()):
+                    variants.setdefault(variant, base.lower())
+    return variants
+
+MULTI_CHAR_VARIANTS = _build_multi_char_variants()
+
+def _multi_char_regex(variant: str) -> str:
+    # A doubled letter ('uu', 'vv') folds only on its own; inside a longer run
+    # it is a stretched letter ('cuuunt') that repetition handling must see
+    if variant.isalpha() and len(set(variant)) == 1:
+        char = re.escape(variant[0])
+        return f'(?<!{char}){re.escape(variant)}(?!{char})'
+    return re.escape(variant)
+
+# Longest-first alternation: the regex engine walks it like a small trie and
+# replaces every leftmost-longest variant in a single scan
+MULTI_CHAR_PATTERN = re.compile(
+    '|'.join(_multi_char_regex(variant) for variant in sorted(MULTI_CHAR_VARIANTS, key=len, reverse=True))
+) if MULTI_CHAR_VARIANTS else None
+
+# No base fold matches, produces or deletes a space, so whitespace-free tokens
+# can be folded as one space-joined string and split apart again
+_BASE_FOLD_KEEPS_SPACES = ord(' ') not in BASE_TABLE and not any(
+    ' ' in (chr(value) if isinstance(value, int) else value or '')
+    for value in (*BASE_TABLE.values(), *MULTI_CHAR_VARIANTS, *MULTI_CHAR_VARIANTS.values())
+)
+
+def _build_skeleton_table() -> Dict[int, str]:
+    """
+    Map every single-character substitution form to one canonical letter.
+    Characters that REVERSE_SUBSTITUTIONS lists as interchangeable in both
+    directions (a/4, b/6/8, e/3, g/9, i/l/1, o/0, s/5, t/7, u/v, z/2) share a
+    representative; every other form folds to its base via NORMALIZATION_MAP.
+    The '*' wildcard stands for almost every letter and is left alone.
+    """
+    parent: Dict[str, str] = {}
+    
+    def find(char: str) -> str:
+        while parent.setdefault(char, char) != char:
+            char = parent[char]
+        return char
+    
+    for form, bases in REVERSE_SUBSTITUTIONS.items():
+        if len(form) == 1 and form.isascii() and form.isalnum():
+            for base in bases:
+                if form in REVERSE_SUBSTITUTIONS.get(base, ()):
+                    first, second = sorted((find(form), find(base)))
+                    parent[second] = first
+    
+    # Prefer a letter as each group's representative so skeletons stay readable
+    representative: Dict[str, str] = {}
+    for char in sorted(parent, key=lambda member: (not member.isalpha(), member)):
+        representative.setdefault(find(char), char)
+    
+    table = {}
+    for form in REVERSE_SUBSTITUTIONS:
+        if len(form) == 1 and form != '*':
+            base = NORMALIZATION_MAP.get(form, form.lower())
+            table[form] = representative[find(base)] if base in parent else base
+    return str.maketrans(table)
+
+# Substitution skeleton: one translate folds every look-alike to a canonical letter
+SKELETON_TABLE = _build_skeleton_table()
+
+def substitution_skeleton(word: str) -> str:
+    """Canonical key under REVERSE_SUBSTITUTIONS (sh1t, 5hit, $hit -> shit)."""
+    return word.translate(SKELETON_TABLE)
 
 # ==================== UTILITY FUNCTIONS - ALL PRESERVED + OPTIMIZED ====================
 
 def remove_hidden_chars(text: str) -> str:
     """PRESERVED: Remove invisible characters that can be used to bypass filters."""
-    for char in HIDDEN_SEPARATORS:
-        text = text.replace(char, '')
-    return text
+    return text.translate(_HIDDEN_TABLE)
 
 def normalize_homoglyphs(text: str) -> str:
     """PRESERVED: Normalize homoglyphs using the HOMOGLYPHS mapping."""
-    return ''.join(HOMOGLYPHS.get(c, c) for c in text)
+    return text.translate(_HOMOGLYPH_TABLE)
 
-def smart_repetition_reducer(text: str, swear_words: set) -> str:
-    """PRESERVED: Optimized swear-aware repetition reduction."""
-    words = text.split()
-    result = []
+def smart_repetition_reducer(text: str, swear_words: set, index: 'RepetitionIndex' = None) -> str:
+    """Swear-aware repetition reduction; stretched swears are a skeleton lookup in the index."""
+    if index is None:
+        index = RepetitionIndex(swear_words)
+    return ' '.join(_reduce_word(word, index) for word in text.split())
+
+def _reduce_word(word: str, index: 'RepetitionIndex') -> str:
+    clean_word = re.sub(r'[^a-zA-Z]', '', word.lower())
+    if len(clean_word) < 3:
+        return word
     
-    for word in words:
-        clean_word = re.sub(r'[^a-zA-Z]', '', word.lower())
-        if len(clean_word) < 3:
-            result.append(word)
-            continue
-            
-        # Check if this matches any swear with repetitions
-        matched_swear = None
-        for swear in swear_words:
-            if len(clean_word) >= len(swear) and matches_with_repetitions(clean_word, swear):
-                matched_swear = swear
-                break
-        
-        if matched_swear:
-            result.append(matched_swear)  # Replace with exact swear
-        else:
-            # Normal reduction: 3+ repeats to 2
-            reduced = re.sub(r'(.)\1{2,}', r'\1\1', word)
-            result.append(reduced)
+    # Check if this matches any swear with repetitions
+    matched_swear = index.lookup(clean_word)
+    if matched_swear:
+        return matched_swear  # Replace with exact swear
     
-    return ' '.join(result)
+    # Normal reduction: 3+ repeats to 2
+    return re.sub(r'(.)\1{2,}', r'\1\1', word)
 
 def matches_with_repetitions(word: str, pattern: str) -> bool:
     """PRESERVED: Check if word matches pattern allowing repetitions."""
@@ -245,65 +371,259 @@ def matches_with_repetitions(word: str, pattern: str) -> bool:
             return False
     return p_idx == len(pattern) and w_idx == len(word)
 
+def collapse_repeats(word: str) -> str:
+    """Collapse every run of a repeated character to one (shhiiit -> shit)."""
+    return _REPEAT_RUN.sub(r'\1', word)
+
+_REPEAT_RUN = re.compile(r'(.)\1+')
+
 def strip_nonalpha_punct(text: str) -> str:
     """PRESERVED: Remove non-alphanumeric characters except spaces."""
     return re.sub(r'[^a-zA-Z0-9\s]', '', text)
 
 def collapse_spaced_letters(text: str) -> str:
     """PRESERVED: Collapse spaced letters like 'f u c k' -> 'fuck'."""
-    return re.sub(r'(?i)\b(?:[a-z]\s+){2,}[a-z]\b', lambda m: m.group(0).replace(' ', ''), text)
+    return SPACED_LETTERS_PATTERN.sub(lambda m: m.group(0).replace(' ', ''), text)
+
+SPACED_LETTERS_PATTERN = re.compile(r'(?i)\b(?:[a-z]\s+){2,}[a-z]\b')
 
 def squeeze_text(text: str) -> str:
     """PRESERVED: Remove all non-alphanumeric characters."""
     return re.sub(r'[^a-zA-Z0-9]', '', text)
 
 def normalize_to_base(text: str) -> str:
-    """FIXED: Hybrid approach - fast translation table + fallback regex."""
-    if not NORMALIZATION_MAP:
-        return text.lower()
-    
-    try:
-        # PERFORMANCE FIX: Use translation table for single chars (fast)
-        if not hasattr(normalize_to_base, '_translation_table'):
-            # Build once and cache
-            normalize_to_base._translation_table = str.maketrans(NORMALIZATION_MAP)
-            
-            # Pre-compute multi-char replacements
-            normalize_to_base._multi_char_replacements = []
-            for base, variants in COMBINED_SUBSTITUTIONS.items():
-                for var in variants:
-                    if len(var) > 1:  # Multi-character variants
-                        normalize_to_base._multi_char_replacements.append((var, base.lower()))
-        
-        # First handle multi-character replacements
-        for old, new in normalize_to_base._multi_char_replacements:
-            text = text.replace(old, new)
-        
-        # Then use fast translation table for single characters
-        text = text.translate(normalize_to_base._translation_table)
-        return text.lower()
-        
-    except Exception as e:
-        # FALLBACK: Original regex method (preserves ALL functionality)
-        logger.debug(f"Translation table failed, using regex fallback: {e}")
-        sorted_variants = sorted(NORMALIZATION_MAP.items(), key=lambda x: -len(x[0]))
-        for variant, base in sorted_variants:
-            try:
-                text = re.sub(re.escape(variant), base, text, flags=re.IGNORECASE)
-            except Exception:
-                continue
-        return text.lower()
+    """
+    Fold text to base letters in one stage: multi-character variants first
+    (leftmost-longest), then hidden characters, homoglyphs and single-character
+    substitutions through one translate table.
+    """
+    if MULTI_CHAR_PATTERN is not None:
+        text = MULTI_CHAR_PATTERN.sub(lambda m: MULTI_CHAR_VARIANTS[m.group()], text)
+    return text.translate(BASE_TABLE).lower()
 
-def preprocess_text_for_filtering(text: str, swear_words: set = None) -> str:
+def preprocess_text_for_filtering(text: str, swear_words: set = None, repetition_index: 'RepetitionIndex' = None) -> str:
     """PRESERVED: Complete text preprocessing pipeline."""
-    text = unicodedata.normalize("NFKC", text)
-    text = remove_hidden_chars(text)
-    text = normalize_homoglyphs(text)
-    text = smart_repetition_reducer(text, swear_words or set())
+    script = classify_script(text)
+    if script == SCRIPT_MIXED:
+        text = unicodedata.normalize("NFKC", text)
+    if script != SCRIPT_ASCII:
+        text = text.translate(PREPROCESS_TABLE)  # hidden chars + homoglyphs in one pass
+    text = smart_repetition_reducer(text, swear_words or set(), repetition_index)
     text = collapse_spaced_letters(text)
     text = strip_nonalpha_punct(text)
     return text.lower().strip()
 
+# Word tokens of the original message: whitespace separates them, except hidden
+# separators (U+2028/U+2029) that preprocessing deletes and so joins across
+_HIDDEN_WHITESPACE = ''.join(re.escape(char) for char in HIDDEN_SEPARATORS if char.isspace())
+_WORD_TOKEN = re.compile(rf'(?:\S|[{_HIDDEN_WHITESPACE}])+' if _HIDDEN_WHITESPACE else r'\S+')
+
+def preprocess_tokens(text: str, swear_words: set = None,
+                      repetition_index: 'RepetitionIndex' = None) -> List[Tuple[str, int, int]]:
+    """
+    Token-aligned form of preprocess_text_for_filtering: the same words, each with
+    the (start, end) span of the original text it came from. Spaced letters
+    ('f u c k') become one word spanning all of their tokens.
+    """
+    if repetition_index is None:
+        repetition_index = RepetitionIndex(swear_words or set())
+    return TokenizedMessage(text).normalized_words(repetition_index)
+
+def _fold_token(token: str, repetition_index: 'RepetitionIndex', script: str) -> Tuple[str, ...]:
+    """NFKC, hidden chars, homoglyphs and repetition reduction for one word token."""
+    if script == SCRIPT_ASCII:
+        # Nothing to fold, and an ASCII token holds no whitespace to split at
+        return (_reduce_word(token, repetition_index),)
+    if script == SCRIPT_LATIN:
+        folded = token.translate(PREPROCESS_TABLE)
+    else:
+        folded = unicodedata.normalize("NFKC", token).translate(PREPROCESS_TABLE)
+    return tuple(_reduce_word(piece, repetition_index) for piece in folded.split())
+
+def _normalize_word_tokens(tokens: List[Tuple[str, int, int]], repetition_index: 'RepetitionIndex',
+                           script: str = SCRIPT_MIXED,
+                           fold_memo: Dict[str, Tuple[str, ...]] = None) -> List[Tuple[str, int, int]]:
+    """
+    preprocess_tokens over already-lexed word tokens of a message in the given
+    script tier. fold_memo, shared by a batch, keeps each distinct token's fold;
+    the tiers are exact shortcuts, so a fold does not depend on the tier.
+    """
+    pieces = []
+    for token, start, end in tokens:
+        if fold_memo is None:
+            folded = _fold_token(token, repetition_index, script)
+        else:
+            folded = fold_memo.get(token)
+            if folded is None:
+                folded = fold_memo[token] = _fold_token(token, repetition_index, script)
+        for piece in folded:
+            pieces.append((piece, start, end))
+    if not pieces:
+        return []
+    
+    # Spaced-letter runs are found on the joined text, exactly as collapse_spaced_letters does
+    joined = ' '.join(piece for piece, _, _ in pieces)
+    starts = []
+    offset = 0
+    for piece, _, _ in pieces:
+        starts.append(offset)
+        offset += len(piece) + 1
+    
+    groups = []
+    index = 0
+    group_first = 0
+    for match in SPACED_LETTERS_PATTERN.finditer(joined):
+        first = bisect_right(starts, match.start()) - 1
+        last = bisect_right(starts, match.end() - 1) - 1
+        if first < index:
+            # Two runs meeting inside one piece collapse into a single word
+            groups.pop()
+            first = group_first
+        groups.extend(pieces[index:first])
+        merged = ''.join(piece for piece, _, _ in pieces[first:last + 1])
+        groups.append((merged, pieces[first][1], pieces[last][2]))
+        index = last + 1
+        group_first = first
+    groups.extend(pieces[index:])
+    
+    words = []
+    for piece, start, end in groups:
+        if script == SCRIPT_ASCII and piece.isalnum():
+            word = piece.lower()
+        else:
+            word = _NON_ALNUM_ASCII.sub('', piece).lower()
+        if word:
+            words.append((word, start, end))
+    return words
+
+_NON_ALNUM_ASCII = re.compile(r'[^a-zA-Z0-9]')
+_HIDDEN_WHITESPACE_SPLIT = re.compile(rf'[{_HIDDEN_WHITESPACE}]+') if _HIDDEN_WHITESPACE else None
+
+class TokenizedMessage:
+    """
+    One lexer pass over a message, shared by the prefilter and every scan stage.
+    Every view is built on first use and then kept, so no stage re-runs a
+    regex over the whole message or lowercases it again; the prefilter, which
+    rejects most clean messages, only ever pays for lower_tokens.
+    """
+    __slots__ = ('text', 'fold_memo', '_script', '_tokens', '_raw_tokens', '_lower_tokens', '_letter_tokens',
+                 '_word_tokens', '_base_tokens', '_distributed', '_normalized', '_normalized_index')
+    
+    def __init__(self, text: str, fold_memo: Dict[str, Tuple[str, ...]] = None):
+        self.text = text
+        self.fold_memo = fold_memo  # Token folds shared with the other messages of a batch
+        self._script = self._tokens = self._raw_tokens = self._lower_tokens = None
+        self._letter_tokens = self._word_tokens = self._base_tokens = self._distributed = None
+        self._normalized = self._normalized_index = None
+    
+    @property
+    def script(self) -> str:
+        """Script tier (classify_script), deciding which normalization steps the words need."""
+        if self._script is None:
+            self._script = classify_script(self.text)
+        return self._script
+    
+    @property
+    def tokens(self) -> List[Tuple[str, int, int]]:
+        """Word tokens with spans: whitespace-separated, but joined across hidden separators."""
+        if self._tokens is None:
+            self._tokens = [(match.group(), match.start(), match.end())
+                            for match in _WORD_TOKEN.finditer(self.text)]
+        return self._tokens
+    
+    @property
+    def raw_tokens(self) -> List[Tuple[str, int, int]]:
+        """Whitespace tokens with spans: word tokens split again at hidden separators."""
+        if self._raw_tokens is None:
+            if _HIDDEN_WHITESPACE_SPLIT is None:
+                self._raw_tokens = self.tokens
+            else:
+                self._raw_tokens = raw = []
+                for token, start, end in self.tokens:
+                    if _HIDDEN_WHITESPACE_SPLIT.search(token) is None:
+                        raw.append((token, start, end))
+                        continue
+                    offset = 0
+                    for part in _HIDDEN_WHITESPACE_SPLIT.split(token):
+                        if part:
+                            position = token.index(part, offset)
+                            raw.append((part, start + position, start + position + len(part)))
+                            offset = position + len(part)
+        return self._raw_tokens
+    
+    @property
+    def lower_tokens(self) -> List[str]:
+        """Lowercased raw tokens, in order; str.split() splits on the same whitespace as _WORD_TOKEN."""
+        if self._lower_tokens is None:
+            self._lower_tokens = self.text.lower().split()
+        return self._lower_tokens
+    
+    @property
+    def letter_tokens(self) -> List[str]:
+        """Raw tokens lowercased and reduced to ASCII letters."""
+        if self._letter_tokens is None:
+            # Tokens hold no spaces, so one pass over the joined tokens does them all
+            lower_tokens = self.lower_tokens
+            self._letter_tokens = _NON_LETTERS_OR_SPACE.sub('', ' '.join(lower_tokens)).split(' ') \
+                if lower_tokens else []
+        return self._letter_tokens
+    
+    @property
+    def word_tokens(self) -> Tuple[str, ...]:
+        """Raw tokens lowercased and split into \\w+ runs, the words context rules look at."""
+        if self._word_tokens is None:
+            words = []
+            for token in self.lower_tokens:
+                if token.isalnum():  # Exactly the tokens that are one \w+ run with no underscore
+                    words.append(token)
+                else:
+                    words.extend(_WORD_TOKENS.findall(token))
+            self._word_tokens = tuple(words)
+        return self._word_tokens
+    
+    @property
+    def base_tokens(self) -> List[str]:
+        """Raw tokens folded to base letters (normalize_to_base), ASCII alphanumerics only."""
+        if self._base_tokens is None:
+            lower_tokens = self.lower_tokens
+            if not lower_tokens:
+                self._base_tokens = []
+            elif _BASE_FOLD_KEEPS_SPACES:
+                folded = normalize_to_base(' '.join(lower_tokens))
+                self._base_tokens = _NON_ALNUM_OR_SPACE.sub('', folded).split(' ')
+            else:
+                self._base_tokens = [_NON_ALNUM.sub('', normalize_to_base(token)) for token in lower_tokens]
+        return self._base_tokens
+    
+    @property
+    def distributed(self) -> str:
+        """The whole message lowercased with everything but ASCII alphanumerics removed."""
+        if self._distributed is None:
+            self._distributed = _NON_ALNUM.sub('', ''.join(self.lower_tokens))
+        return self._distributed
+    
+    @property
+    def text_span(self) -> Tuple[int, int]:
+        """From the first to the last non-whitespace character."""
+        raw = self.raw_tokens
+        return (raw[0][1], raw[-1][2]) if raw else (0, 0)
+    
+    def normalized_words(self, repetition_index: 'RepetitionIndex') -> List[Tuple[str, int, int]]:
+        """preprocess_tokens' words with spans; kept for the repetition index it was built with."""
+        if self._normalized is None or self._normalized_index is not repetition_index:
+            self._normalized = _normalize_word_tokens(self.tokens, repetition_index, self.script, self.fold_memo)
+            self._normalized_index = repetition_index
+        return self._normalized
+
+def mask_spans(text: str, spans: Iterable[Tuple[int, int, str]], mask_char: str = '*') -> str:
+    """Replace every character covered by a (start, end, word) span, keeping whitespace."""
+    chars = list(text)
+    for start, end, _ in spans:
+        for i in range(start, end):
+            if not chars[i].isspace():
+                chars[i] = mask_char
+    return ''.join(chars)
+
 def extract_words(text: str) -> List[str]:
     """PRESERVED: Extract meaningful words from text."""
     # Find word-like sequences
@@ -316,81 +636,271 @@ def extract_words(text: str) -> List[str]:
     
     return [word.lower() for word in words if len(word) >= 2]
 
-def expand_all_normalizations(word: str, max_variants: int = 100) -> set:
-    """PERFORMANCE FIX: Smart limits to prevent exponential explosion while preserving detection."""
-    # ISSUE 1 FIX: Prevent exponential performance explosion
-    if not COMBINED_SUBSTITUTIONS or len(word) > 5:  # Reduced from 6
-        return {word}
+# ==================== COMPILED DICTIONARY FORMAT ====================
+# english-words.60 is compiled into a sorted, packed string table next to the
+# source file and opened with mmap. Lookups are a bucketed binary search over
+# the mapped bytes, so the words never become Python objects and every bot
+# process on the host shares the same page-cache pages.
+#
+# Layout (little-endian):
+#   header   magic, format version, source size, source mtime_ns,
+#            COMMON_SAFE_WORDS checksum, word count
+#   buckets  65,537 x uint32: first word index for each two-byte prefix
+#   offsets  (count + 1) x uint32: start of each word in the blob
+#   blob     concatenated UTF-8 words, sorted bytewise
+
+DICTIONARY_FILENAME = 'english-words.60'
+COMPILED_DICTIONARY_SUFFIX = '.bin'
+_DICT_MAGIC = b'SWDICT\x00\x00'
+_DICT_VERSION = 1
+_DICT_HEADER = struct.Struct('<8sIQQII')
+_DICT_BUCKETS = 0x10000
+
+def _find_dictionary() -> Optional[str]:
+    """Locate english-words.60 in the usual places."""
+    dictionary_paths = [
+        DICTIONARY_FILENAME,
+        os.path.join('.', DICTIONARY_FILENAME),
+        os.path.join(os.path.dirname(__file__), DICTIONARY_FILENAME),
+        os.path.join(os.path.dirname(__file__), '..', DICTIONARY_FILENAME),
+    ]
+    for path in dictionary_paths:
+        if os.path.exists(path):
+            return path
+    return None
+
+def _read_text_dictionary(path: str) -> Set[str]:
+    """Parse the plain-text word list (one word per line)."""
+    words = set()
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            word = line.strip().lower()
+            if len(word) >= 2 and word.isalpha():
+                words.add(word)
+    return words
+
+def _common_words_checksum() -> int:
+    return zlib.crc32('\n'.join(sorted(COMMON_SAFE_WORDS)).encode('utf-8'))
+
+def _bucket_of(encoded: bytes) -> int:
+    return (encoded[0] << 8) | (encoded[1] if len(encoded) > 1 else 0)
+
+def compile_dictionary(source_path: str, target_path: str):
+    """Write the packed, sorted string table for source_path to target_path."""
+    stat = os.stat(source_path)
+    words = _read_text_dictionary(source_path) | set(COMMON_SAFE_WORDS)
+    encoded = sorted(word.encode('utf-8') for word in words)
+    
+    buckets = array('I', [0]) * (_DICT_BUCKETS + 1)
+    offsets = array('I', [0]) * (len(encoded) + 1)
+    position = 0
+    for index, word in enumerate(encoded):
+        offsets[index] = position
+        position += len(word)
+    offsets[len(encoded)] = position
+    
+    # buckets[k] = index of the first word whose two-byte prefix is >= k
+    index = 0
+    for bucket in range(_DICT_BUCKETS + 1):
+        while index < len(encoded) and _bucket_of(encoded[index]) < bucket:
+            index += 1
+        buckets[bucket] = index
     
-    possibilities = []
-    total_combinations = 1
+    if sys.byteorder != 'little':
+        buckets.byteswap()
+        offsets.byteswap()
+    
+    header = _DICT_HEADER.pack(_DICT_MAGIC, _DICT_VERSION, stat.st_size, stat.st_mtime_ns,
+                               _common_words_checksum(), len(encoded))
+    
+    # Write to a temporary file and rename so concurrent processes never see a partial file
+    tmp_path = f"{target_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(header)
+            f.write(buckets.tobytes())
+            f.write(offsets.tobytes())
+            f.write(b''.join(encoded))
+        os.replace(tmp_path, target_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+class MappedWordList:
+    """Read-only, memory-mapped view of a compiled dictionary file."""
     
-    for char in word:
-        options = list(REVERSE_SUBSTITUTIONS.get(char, {char}))[:2]  # Reduced from 3
-        possibilities.append(options)
-        total_combinations *= len(options)
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        magic, version, self.source_size, self.source_mtime_ns, self.common_checksum, count = \
+            _DICT_HEADER.unpack_from(self._mm, 0)
+        if magic != _DICT_MAGIC or version != _DICT_VERSION:
+            self._mm.close()
+            raise ValueError(f"{path} is not a compiled dictionary (version {_DICT_VERSION})")
         
-        # EARLY EXIT: If too many combinations, skip expansion
-        if total_combinations > max_variants:
-            return {word}
+        self._count = count
+        buckets_start = _DICT_HEADER.size
+        offsets_start = buckets_start + 4 * (_DICT_BUCKETS + 1)
+        self._blob_start = offsets_start + 4 * (count + 1)
+        
+        view = memoryview(self._mm)
+        self._buckets = view[buckets_start:offsets_start].cast('I')
+        self._offsets = view[offsets_start:self._blob_start].cast('I')
+    
+    def is_current(self, source_path: str) -> bool:
+        """True if this file was compiled from source_path as it is now."""
+        stat = os.stat(source_path)
+        return (self.source_size == stat.st_size and
+                self.source_mtime_ns == stat.st_mtime_ns and
+                self.common_checksum == _common_words_checksum())
     
-    all_combos = set()
-    count = 0
+    def _word_at(self, index: int) -> bytes:
+        start = self._blob_start + self._offsets[index]
+        return self._mm[start:self._blob_start + self._offsets[index + 1]]
+    
+    def __contains__(self, word) -> bool:
+        if not isinstance(word, str) or not word:
+            return False
+        key = word.encode('utf-8', 'surrogatepass')
+        bucket = _bucket_of(key)
+        lo, hi = self._buckets[bucket], self._buckets[bucket + 1]
+        mm, offsets, base = self._mm, self._offsets, self._blob_start
+        while lo < hi:
+            mid = (lo + hi) >> 1
+            if mm[base + offsets[mid]:base + offsets[mid + 1]] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo < self._count and mm[base + offsets[lo]:base + offsets[lo + 1]] == key
     
-    for combo in product(*possibilities):
-        if count >= max_variants:
-            break
-        all_combos.add(''.join(combo))
-        count += 1
+    def __len__(self) -> int:
+        return self._count
     
-    return all_combos
+    def __iter__(self):
+        for index in range(self._count):
+            yield self._word_at(index).decode('utf-8')
 
-def load_safe_words(swear_words: set = None) -> set:
-    """Fixed: Actually load the english-words.60 file"""
-    safe_words = set(COMMON_SAFE_WORDS)
+def open_compiled_dictionary(source_path: str) -> MappedWordList:
+    """Open the compiled form of source_path, (re)building it if missing or stale."""
+    target_path = source_path + COMPILED_DICTIONARY_SUFFIX
+    if os.path.exists(target_path):
+        try:
+            words = MappedWordList(target_path)
+            if words.is_current(source_path):
+                return words
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable compiled dictionary {target_path}: {e}")
     
-    # Try to load from english-words.60 file
-    dictionary_paths = [
-        'english-words.60',
-        './english-words.60',
-        os.path.join(os.path.dirname(__file__), 'english-words.60'),
-        os.path.join(os.path.dirname(__file__), '..', 'english-words.60'),
-    ]
+    logger.info(f"Compiling dictionary {source_path} -> {target_path}")
+    compile_dictionary(source_path, target_path)
+    return MappedWordList(target_path)
+
+def load_safe_words(swear_words: set = None):
+    """
+    Load the english-words.60 dictionary plus COMMON_SAFE_WORDS.
+    Uses the memory-mapped compiled form when possible and falls back to parsing
+    the text file. Passing swear_words returns a plain set with conflicts removed.
+    """
+    path = _find_dictionary()
+    safe_words = None
     
-    for path in dictionary_paths:
+    if path is None:
+        logger.warning("Could not find english-words.60 file, using built-in safe words only")
+        safe_words = frozenset(COMMON_SAFE_WORDS)
+    else:
+        logger.info(f"Loading dictionary from: {path}")
         try:
-            if os.path.exists(path):
-                logger.info(f"Loading dictionary from: {path}")
-                with open(path, 'r', encoding='utf-8') as f:
-                    for line in f:
-                        word = line.strip().lower()
-                        if len(word) >= 2 and word.isalpha():
-                            safe_words.add(word)
-                logger.info(f"Loaded {len(safe_words)} total safe words")
-                break
+            safe_words = open_compiled_dictionary(path)
         except Exception as e:
-            logger.warning(f"Could not load dictionary from {path}: {e}")
-            continue
-    else:
-        logger.warning("Could not find english-words.60 file, using built-in safe words only")
+            logger.warning(f"Could not use compiled dictionary for {path}, parsing text instead: {e}")
+        
+        if safe_words is None:
+            try:
+                safe_words = frozenset(_read_text_dictionary(path) | set(COMMON_SAFE_WORDS))
+            except Exception as e:
+                logger.warning(f"Could not load dictionary from {path}: {e}")
+                safe_words = frozenset(COMMON_SAFE_WORDS)
+        logger.info(f"Loaded {len(safe_words)} total safe words")
     
     # Remove any safe words that are also swear words (conflict resolution)
     if swear_words:
-        safe_words -= swear_words
         logger.info(f"Removed {len(swear_words & set(COMMON_SAFE_WORDS))} conflicting words")
+        return set(safe_words) - swear_words
     
     return safe_words
 
-def levenshtein_distance(a: str, b: str, max_distance: int = 2) -> int:
+# ==================== SHARED SAFE-WORD DICTIONARY ====================
+# The english-words.60 dictionary is identical for every guild, so it is loaded
+# once per process and shared read-only by every SwearFilter.
+
+_shared_safe_words = None
+_shared_safe_words_lock = threading.Lock()
+
+def get_shared_safe_words():
+    """Return the process-wide safe-word dictionary, loading it on first use."""
+    global _shared_safe_words
+    if _shared_safe_words is None:
+        with _shared_safe_words_lock:
+            if _shared_safe_words is None:
+                _shared_safe_words = load_safe_words()
+    return _shared_safe_words
+
+class SafeWordSet:
     """
-    Fast Levenshtein distance with early termination.
-    Returns distance or max_distance+1 if exceeds threshold.
+    Per-guild view of the safe words: the shared read-only dictionary plus a
+    small overlay of guild whitelist words. Only the overlay can be modified.
+    """
+    
+    def __init__(self, base, overlay: Iterable[str] = ()):
+        self.base = base
+        self.overlay: Set[str] = set()
+        self.version = 0  # Bumped on every overlay change so filters can drop memoized verdicts
+        self.update(overlay)
+    
+    def __contains__(self, word) -> bool:
+        return word in self.base or word in self.overlay
+    
+    def __len__(self) -> int:
+        return len(self.base) + sum(1 for word in self.overlay if word not in self.base)
+    
+    def __iter__(self):
+        yield from self.base
+        for word in self.overlay:
+            if word not in self.base:
+                yield word
+    
+    def add(self, word: str):
+        word = word.lower().strip()
+        if word not in self.overlay:
+            self.overlay.add(word)
+            self.version += 1
+    
+    def update(self, words: Iterable[str]):
+        for word in words:
+            self.add(word)
+    
+    def discard(self, word: str):
+        """Remove a whitelist word; dictionary words are never removed."""
+        word = word.lower().strip()
+        if word in self.overlay:
+            self.overlay.discard(word)
+            self.version += 1
+    
+    def difference_update(self, words: Iterable[str]):
+        for word in words:
+            self.discard(word)
+
+def _levenshtein_dp(a: str, b: str, max_distance: int = 2) -> int:
+    """
+    Row-by-row dynamic-programming Levenshtein distance with early termination.
+    Used for words longer than BIT_PARALLEL_MAX_LENGTH.
     """
     if abs(len(a) - len(b)) > max_distance:
         return max_distance + 1
     
     if len(a) < len(b):
-        return levenshtein_distance(b, a, max_distance)
+        return _levenshtein_dp(b, a, max_distance)
 
     if len(b) == 0:
         return len(a)
@@ -416,10 +926,163 @@ def levenshtein_distance(a: str, b: str, max_distance: int = 2) -> int:
 
     return previous_row[-1]
 
-def is_bypass_attempt(word: str, swear_words: set, safe_words: set) -> tuple[bool, str]:
+# ==================== BIT-PARALLEL EDIT DISTANCE ====================
+# Myers/Hyyrö bit-vector algorithm: one column of the DP matrix is held in two
+# bit masks and updated with a handful of integer operations per character, so
+# the inner loop over the pattern disappears. Words up to 64 characters fit a
+# machine word; longer ones fall back to _levenshtein_dp.
+
+BIT_PARALLEL_MAX_LENGTH = 64
+
+def _pattern_bits(pattern: str) -> Dict[str, int]:
+    """Bit mask of the positions of each character in pattern."""
+    peq: Dict[str, int] = {}
+    for i, char in enumerate(pattern):
+        peq[char] = peq.get(char, 0) | (1 << i)
+    return peq
+
+def _myers_distance(peq: Dict[str, int], m: int, text: str, max_distance: int) -> int:
+    """Bounded distance between the pattern described by (peq, m) and text."""
+    mask = (1 << m) - 1
+    last = 1 << (m - 1)
+    pv, mv = mask, 0
+    score = m
+    remaining = len(text)
+    
+    for char in text:
+        eq = peq.get(char, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (~(xh | pv) & mask)
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        
+        # The final distance can drop by at most one per remaining character
+        remaining -= 1
+        if score - remaining > max_distance:
+            return max_distance + 1
+        
+        ph = ((ph << 1) | 1) & mask
+        mh = (mh << 1) & mask
+        pv = mh | (~(xv | ph) & mask)
+        mv = ph & xv
+    
+    return score if score <= max_distance else max_distance + 1
+
+def levenshtein_distance(a: str, b: str, max_distance: int = 2) -> int:
+    """
+    Fast Levenshtein distance with early termination.
+    Returns distance or max_distance+1 if exceeds threshold.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    
+    if len(a) < len(b):
+        a, b = b, a
+    
+    if len(b) == 0:
+        return len(a)
+    
+    if len(b) > BIT_PARALLEL_MAX_LENGTH:
+        return _levenshtein_dp(a, b, max_distance)
+    
+    return _myers_distance(_pattern_bits(b), len(b), a, max_distance)
+
+def bounded_edit_distances(token: str, candidates: Iterable[str], max_distance: int = 2) -> List[Tuple[str, int]]:
+    """
+    Batch form of levenshtein_distance: compare one token against many candidates,
+    building the token's bit masks once. Returns [(candidate, distance)] for the
+    candidates within max_distance, in input order.
+    """
+    if len(token) == 0 or len(token) > BIT_PARALLEL_MAX_LENGTH:
+        return [
+            (candidate, distance) for candidate in candidates
+            for distance in (levenshtein_distance(token, candidate, max_distance),)
+            if distance <= max_distance
+        ]
+    
+    peq = _pattern_bits(token)
+    m = len(token)
+    matches = []
+    for candidate in candidates:
+        if abs(len(candidate) - m) > max_distance:
+            continue
+        distance = _myers_distance(peq, m, candidate, max_distance) if candidate else m
+        if distance <= max_distance:
+            matches.append((candidate, distance))
+    return matches
+
+class DeletionIndex:
+    """
+    SymSpell-style index answering "which words are within edit distance N of
+    this token" without scanning the word list. Every word is stored under all
+    strings reachable by deleting up to N characters; two words within distance
+    N always share one of those keys, so a query only verifies the few words
+    found under the token's own deletes.
+    """
+    
+    def __init__(self, words=(), max_distance: int = 2):
+        self.max_distance = max_distance
+        # Buckets are immutable and replaced on edit, so lookups need no lock
+        self._index: Dict[str, FrozenSet[str]] = {}
+        self.words: Set[str] = set()
+        for word in words:
+            self.add(word)
+    
+    def __len__(self) -> int:
+        return len(self.words)
+    
+    def _deletes(self, word: str) -> Set[str]:
+        keys = {word}
+        frontier = {word}
+        for _ in range(self.max_distance):
+            frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+            keys |= frontier
+        return keys
+    
+    def add(self, word: str):
+        if word in self.words:
+            return
+        self.words.add(word)
+        index = self._index
+        for key in self._deletes(word):
+            index[key] = index.get(key, frozenset()) | {word}
+    
+    def remove(self, word: str):
+        if word not in self.words:
+            return
+        self.words.discard(word)
+        for key in self._deletes(word):
+            bucket = self._index.get(key)
+            if bucket is not None:
+                bucket = bucket - {word}
+                if bucket:
+                    self._index[key] = bucket
+                else:
+                    del self._index[key]
+    
+    def lookup(self, token: str, max_distance: int = None) -> List[Tuple[str, int]]:
+        """Return [(word, distance)] within max_distance, closest first then alphabetical."""
+        max_distance = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        candidates = set()
+        for key in self._deletes(token):
+            bucket = self._index.get(key)
+            if bucket:
+                candidates |= bucket
+        
+        matches = bounded_edit_distances(token, candidates, max_distance)
+        matches.sort(key=lambda match: (match[1], match[0]))
+        return matches
+
+def is_bypass_attempt(word: str, swear_words: set, safe_words: set,
+                      fuzzy_index: DeletionIndex = None) -> tuple[bool, str]:
     """
     Check if word is suspiciously close to any swear word but not a legitimate word.
     Only triggers if word is NOT exactly in safe dictionary.
+    With a fuzzy_index, candidates come from the index instead of a scan of swear_words.
     """
     word_lower = word.lower()
     
@@ -431,22 +1094,18 @@ def is_bypass_attempt(word: str, swear_words: set, safe_words: set) -> tuple[boo
     if len(word_lower) < 3 or len(word_lower) > 10:
         return False, ""
     
-    # Check similarity to swear words
-    for swear in swear_words:
-        # Skip very different lengths (performance optimization)
-        if abs(len(word_lower) - len(swear)) > 2:
-            continue
-            
-        distance = levenshtein_distance(word_lower, swear, 2)
+    if fuzzy_index is None:
+        fuzzy_index = DeletionIndex(swear_words)
+    
+    # Check similarity to swear words (closest first)
+    for swear, distance in fuzzy_index.lookup(word_lower, 2):
+        # Additional filters to reduce false positives
         
-        if distance <= 2:
-            # Additional filters to reduce false positives
+        # Allow common English patterns that are legitimate
+        if _is_likely_legitimate_pattern(word_lower, swear):
+            continue
             
-            # Allow common English patterns that are legitimate
-            if _is_likely_legitimate_pattern(word_lower, swear):
-                continue
-                
-            return True, swear
+        return True, swear
     
     return False, ""
 
@@ -474,34 +1133,736 @@ def _is_likely_legitimate_pattern(word: str, swear: str) -> bool:
     return False
 
 
+# ==================== CONTEXT WHITELIST MATCHER ====================
+
+_TOKEN_RULE = re.compile(r'\\b([^\W\d_]+)(\\w\*)?\\b')
+_WORD_TOKENS = re.compile(r'\w+')
+
+class ContextWhitelist:
+    """
+    Compiled context whitelist: for each swear, the surrounding words that make
+    it innocent (e.g. 'ass' inside a message that says 'class' or 'passage').
+    
+    Rules map a swear to either the CONTEXT_WHITELIST form ({'patterns': [regex,
+    ...]}) or a list of token rules such as ['class*', 'pass*', 'wherein'].
+    Token rules and regexes shaped like \bword\w*\b / \bword\b are turned into
+    prefix and exact-token lookups; any other regex is combined into a single
+    compiled alternation per swear. A check is then one pass over the message's
+    TokenizedMessage.word_tokens, which every stage of a scan shares.
+    """
+    
+    def __init__(self, rules: Dict[str, object] = None):
+        self._exact: Dict[str, Set[str]] = {}
+        self._prefixes: Dict[str, Tuple[str, ...]] = {}
+        self._regex: Dict[str, re.Pattern] = {}
+        
+        for word, rule in (rules or {}).items():
+            self.add_rules(word, rule['patterns'] if isinstance(rule, dict) else rule)
+    
+    def __contains__(self, word: str) -> bool:
+        return word in self._exact or word in self._prefixes or word in self._regex
+    
+    def add_rules(self, word: str, patterns: Iterable[str]):
+        """Compile and merge rules for one swear."""
+        word = word.lower().strip()
+        exact = set(self._exact.get(word, ()))
+        prefixes = set(self._prefixes.get(word, ()))
+        regexes = [self._regex[word].pattern] if word in self._regex else []
+        
+        for pattern in patterns:
+            token_rule = _TOKEN_RULE.fullmatch(pattern)
+            if token_rule:
+                (prefixes if token_rule.group(2) else exact).add(token_rule.group(1).lower())
+            elif re.fullmatch(r'[^\W\d_]+\*?', pattern):
+                (prefixes if pattern.endswith('*') else exact).add(pattern.rstrip('*').lower())
+            else:
+                regexes.append(f'(?:{pattern})')
+        
+        if exact:
+            self._exact[word] = exact
+        if prefixes:
+            self._prefixes[word] = tuple(sorted(prefixes))
+        if regexes:
+            self._regex[word] = re.compile('|'.join(regexes), re.IGNORECASE)
+    
+    def is_whitelisted(self, message: 'TokenizedMessage', word: str) -> bool:
+        """True if message contains a context that whitelists word."""
+        if isinstance(message, str):
+            message = TokenizedMessage(message)
+        exact = self._exact.get(word)
+        prefixes = self._prefixes.get(word)
+        if exact or prefixes:
+            for token in message.word_tokens:
+                if (exact and token in exact) or (prefixes and token.startswith(prefixes)):
+                    return True
+        
+        regex = self._regex.get(word)
+        return bool(regex and regex.search(message.text))
+
+DEFAULT_CONTEXT_WHITELIST = ContextWhitelist(CONTEXT_WHITELIST)
+
+# Context rules as hashable data: (swear, sorted patterns) pairs; empty = DEFAULT_CONTEXT_WHITELIST
+ContextRules = FrozenSet[Tuple[str, Tuple[str, ...]]]
+
+def canonical_context_rules(rules) -> ContextRules:
+    """
+    Canonical form of a context-rules mapping (or of pairs already in this form),
+    so equal rules hash and compare equal and can be sent to a worker process.
+    """
+    merged: Dict[str, Set[str]] = {}
+    for word, rule in (rules.items() if isinstance(rules, dict) else rules or ()):
+        patterns = rule['patterns'] if isinstance(rule, dict) else rule
+        merged.setdefault(word.lower().strip(), set()).update(patterns)
+    return frozenset((word, tuple(sorted(patterns))) for word, patterns in merged.items())
+
+
+# ==================== REPETITION-TOLERANT INDEX ====================
+
+def run_lengths(word: str) -> Tuple[str, Tuple[int, ...]]:
+    """Split a word into its collapsed skeleton and run lengths (shiiit -> 'shit', (1, 1, 3, 1))."""
+    runs = [match.group(0) for match in _CHAR_RUN.finditer(word)]
+    return ''.join(run[0] for run in runs), tuple(len(run) for run in runs)
+
+_CHAR_RUN = re.compile(r'(.)\1*', re.DOTALL)
+
+class RepetitionIndex:
+    """
+    Swear words keyed by their run-length-collapsed skeleton (shit -> shit, hell -> hel).
+    A token is a stretched swear when it has the same skeleton and every run is at
+    least as long as the swear's own, so shiiiit -> shit and heeellll -> hell are
+    a single dict lookup instead of a pass over the whole word list.
+    """
+    
+    def __init__(self, words=()):
+        # Entry tuples are replaced, never edited, so lookups need no lock
+        self._by_skeleton: Dict[str, Tuple[Tuple[str, Tuple[int, ...]], ...]] = {}
+        self.words: Set[str] = set()
+        for word in words:
+            self.add(word)
+    
+    def __len__(self) -> int:
+        return len(self.words)
+    
+    def add(self, word: str):
+        if not word or word in self.words:
+            return
+        skeleton, runs = run_lengths(word)
+        entries = self._by_skeleton.get(skeleton, ()) + ((word, runs),)
+        # Least-stretched swear first so 'fuuuk' reports 'fuk' before 'fuuk'
+        self._by_skeleton[skeleton] = tuple(sorted(entries, key=lambda entry: (sum(entry[1]), entry[0])))
+        self.words.add(word)
+    
+    def remove(self, word: str):
+        if word not in self.words:
+            return
+        self.words.discard(word)
+        skeleton = collapse_repeats(word)
+        entries = tuple(entry for entry in self._by_skeleton.get(skeleton, ()) if entry[0] != word)
+        if entries:
+            self._by_skeleton[skeleton] = entries
+        else:
+            self._by_skeleton.pop(skeleton, None)
+    
+    def lookup(self, token: str) -> Optional[str]:
+        """Return the swear that token is a stretched form of, or None."""
+        entries = self._by_skeleton.get(collapse_repeats(token))
+        if not entries:
+            return None
+        runs = run_lengths(token)[1]
+        for word, needed in entries:
+            if all(have >= need for have, need in zip(runs, needed)):
+                return word
+        return None
+
+
+class SubstitutionIndex:
+    """
+    Swear words keyed by their substitution skeleton. A token written with
+    look-alike characters (sh1t, b!tch, cvnt) is one translate plus one dict
+    lookup, at any length, instead of expanding its variant combinations.
+    """
+    
+    def __init__(self, words=()):
+        # Buckets are immutable and replaced on edit, so lookups need no lock
+        self._by_skeleton: Dict[str, FrozenSet[str]] = {}
+        self.words: Set[str] = set()
+        for word in words:
+            self.add(word)
+    
+    def __len__(self) -> int:
+        return len(self.words)
+    
+    def add(self, word: str):
+        if word and word not in self.words:
+            skeleton = substitution_skeleton(word)
+            self._by_skeleton[skeleton] = self._by_skeleton.get(skeleton, frozenset()) | {word}
+            self.words.add(word)
+    
+    def remove(self, word: str):
+        if word not in self.words:
+            return
+        self.words.discard(word)
+        skeleton = substitution_skeleton(word)
+        bucket = self._by_skeleton.get(skeleton, frozenset()) - {word}
+        if bucket:
+            self._by_skeleton[skeleton] = bucket
+        else:
+            self._by_skeleton.pop(skeleton, None)
+    
+    def lookup(self, token: str) -> Optional[str]:
+        """Return the swear sharing token's skeleton (alphabetically first), or None."""
+        matches = self._by_skeleton.get(substitution_skeleton(token))
+        return min(matches) if matches else None
+
+
+def inflected_forms(swear: str) -> Set[str]:
+    """
+    Every word SUFFIX_RULES and INFLECTION_PREFIXES accept for one swear, with
+    or without a doubled joining consonant (shitting, shits, unfuck, unnfuck).
+    """
+    forms = set()
+    for suffix, rules in SUFFIX_RULES.items():
+        for root in (swear, swear + swear[-1]) if len(swear) >= 2 else (swear,):
+            form = root + suffix
+            if len(form) >= rules['min_length'] and form not in rules['exceptions']:
+                forms.add(form)
+    for prefix in INFLECTION_PREFIXES:
+        if len(swear) >= 3:
+            forms.add(prefix + swear)
+        if len(swear) >= 2:
+            forms.add(prefix + swear[0] + swear)
+    return forms
+
+class InflectionIndex:
+    """
+    Precomputed suffix/prefix table: each inflected or prefixed form maps to
+    the swears it derives from, so the suffix check is one dict lookup instead
+    of walking the rules per token. A form counts only while one of its swears
+    is not a safe word, which is checked at lookup so whitelist changes need
+    no rebuild.
+    """
+    
+    def __init__(self, words=()):
+        # Source sets are immutable and replaced on edit, so lookups need no lock
+        self._sources: Dict[str, FrozenSet[str]] = {}
+        self.words: Set[str] = set()
+        for word in words:
+            self.add(word)
+    
+    def __len__(self) -> int:
+        return len(self._sources)
+    
+    def add(self, word: str):
+        if word and word not in self.words:
+            self.words.add(word)
+            sources = self._sources
+            for form in inflected_forms(word):
+                sources[form] = sources.get(form, frozenset()) | {word}
+    
+    def remove(self, word: str):
+        if word not in self.words:
+            return
+        self.words.discard(word)
+        for form in inflected_forms(word):
+            remaining = self._sources.get(form, frozenset()) - {word}
+            if remaining:
+                self._sources[form] = remaining
+            else:
+                self._sources.pop(form, None)
+    
+    def lookup(self, token: str, safe_words) -> Optional[str]:
+        """Return the swear token inflects (alphabetically first non-safe one), or None."""
+        sources = self._sources.get(token)
+        if not sources:
+            return None
+        return min((swear for swear in sources if swear not in safe_words), default=None)
+    
+    def table(self, safe_words=()) -> Dict[str, List[str]]:
+        """The active form -> swears table, sorted, for auditing."""
+        table = {}
+        for form in sorted(self._sources):
+            swears = sorted(swear for swear in self._sources[form] if swear not in safe_words)
+            if swears:
+                table[form] = swears
+        return table
+
+
+# Token lengths the transposition check applies to
+TRANSPOSITION_MIN_LENGTH = 3
+TRANSPOSITION_MAX_LENGTH = 6
+
+class TranspositionIndex:
+    """
+    Every single adjacent-swap form of each 3-6 letter swear (fcuk, suhit), so
+    transposition detection is a dict lookup instead of rebuilding the token
+    once per swap position. A form reachable from several swears resolves to
+    the one whose swap comes first in the token, as the old scan did.
+    """
+    
+    def __init__(self, words=()):
+        # Entry tuples are replaced, never edited, so lookups need no lock
+        self._forms: Dict[str, Tuple[Tuple[int, str], ...]] = {}
+        self.words: Set[str] = set()
+        for word in words:
+            self.add(word)
+    
+    def __len__(self) -> int:
+        return len(self._forms)
+    
+    @staticmethod
+    def _swaps(word: str) -> Iterable[Tuple[int, str]]:
+        for i in range(len(word) - 1):
+            swapped = word[:i] + word[i + 1] + word[i] + word[i + 2:]
+            if swapped != word:
+                yield i, swapped
+    
+    def add(self, word: str):
+        if word in self.words or not TRANSPOSITION_MIN_LENGTH <= len(word) <= TRANSPOSITION_MAX_LENGTH:
+            return
+        self.words.add(word)
+        for position, form in self._swaps(word):
+            self._forms[form] = tuple(sorted(self._forms.get(form, ()) + ((position, word),)))
+    
+    def remove(self, word: str):
+        if word not in self.words:
+            return
+        self.words.discard(word)
+        for position, form in self._swaps(word):
+            entries = tuple(entry for entry in self._forms.get(form, ()) if entry != (position, word))
+            if entries:
+                self._forms[form] = entries
+            else:
+                self._forms.pop(form, None)
+    
+    def lookup(self, token: str) -> Optional[str]:
+        entries = self._forms.get(token)
+        return entries[0][1] if entries else None
+
+
+# ==================== VERDICT CACHE ====================
+
+class ScanResult(NamedTuple):
+    """
+    Full verdict for one message. spans holds (start, end, swear) for every hit,
+    as character offsets into the original message, so a masked copy can be
+    built without normalizing the message again.
+    """
+    contains_swear: bool
+    blocked_words: List[str]
+    spans: List[Tuple[int, int, str]]
+    degraded: bool = False  # The scan budget ran out; later words got the exact stages only
+
+class VerdictCache:
+    """
+    Bounded LRU cache of message verdicts with a TTL; get, put and evict are O(1).
+    Entries are keyed by a 16-byte BLAKE2b digest so a 4,000-character message
+    costs the same as a short one, and the bound is an estimated byte budget
+    rather than an entry count.
+    
+    clear() bumps generation. A caller that scans outside the cache reads
+    generation first and passes it to put, so a verdict computed against rules
+    that changed mid-scan is dropped instead of being served for the TTL.
+    """
+    
+    # Approximate fixed cost per entry: digest key, OrderedDict node, entry and result tuples
+    ENTRY_OVERHEAD = 240
+    # Approximate cost of one (start, end, swear) span tuple
+    SPAN_OVERHEAD = 96
+    
+    def __init__(self, max_bytes: int = 256 * 1024, ttl: float = 300):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: 'OrderedDict[bytes, Tuple[ScanResult, float, int]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.generation = 0
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    @staticmethod
+    def key(message: str) -> bytes:
+        return hashlib.blake2b(message.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+    
+    def _entry_size(self, result: ScanResult) -> int:
+        return (self.ENTRY_OVERHEAD + sum(sys.getsizeof(word) + 8 for word in result.blocked_words)
+                + self.SPAN_OVERHEAD * len(result.spans))
+    
+    def get(self, message: str) -> Optional[ScanResult]:
+        key = self.key(message)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                result, expires_at, size = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return result
+                del self._entries[key]
+                self.bytes_used -= size
+                self.expirations += 1
+            self.misses += 1
+            return None
+    
+    def get_many(self, messages: List[str]) -> List[Optional[ScanResult]]:
+        """get() for a batch: digests are taken outside the lock, which is held once."""
+        keys = [self.key(message) for message in messages]
+        results = []
+        with self._lock:
+            now = time.monotonic()
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    result, expires_at, size = entry
+                    if expires_at > now:
+                        self._entries.move_to_end(key)
+                        self.hits += 1
+                        results.append(result)
+                        continue
+                    del self._entries[key]
+                    self.bytes_used -= size
+                    self.expirations += 1
+                self.misses += 1
+                results.append(None)
+        return results
+    
+    def put(self, message: str, result: ScanResult, generation: int = None):
+        self.put_many([(message, result)], generation)
+    
+    def put_many(self, items: Iterable[Tuple[str, ScanResult]], generation: int = None):
+        """
+        Store (message, result) pairs under one lock acquisition. With a
+        generation, nothing is stored if the cache was cleared since it was read.
+        """
+        entries = []
+        for message, result in items:
+            size = self._entry_size(result)
+            if size <= self.max_bytes:
+                entries.append((self.key(message), result, size))
+        if not entries:
+            return
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            expires_at = time.monotonic() + self.ttl
+            for key, result, size in entries:
+                previous = self._entries.pop(key, None)
+                if previous is not None:
+                    self.bytes_used -= previous[2]
+                self._entries[key] = (result, expires_at, size)
+                self.bytes_used += size
+            # Least recently used entries go first
+            while self.bytes_used > self.max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self.bytes_used -= evicted_size
+                self.evictions += 1
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes_used = 0
+            self.generation += 1
+    
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.bytes_used,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+# ==================== CLEAN-MESSAGE PREFILTER ====================
+# Plain ASCII messages (letters, whitespace and punctuation that is never a
+# substitution form) come out of NFKC, hidden-character and homoglyph folding
+# unchanged, so every view the pipeline builds from them is derived from the
+# message's whitespace tokens. That is what lets the prefilter be exact for them.
+
+PLAIN_TEXT_CHARS = frozenset(
+    char for char in string.ascii_letters + string.punctuation + ' \t\n\r'
+    if ord(char) not in PREPROCESS_TABLE and (
+        char.isalpha() or (
+            ord(char) not in BASE_TABLE
+            and char not in SHORT_SWEAR_STRIP_CHARS  # stripped by _check_short_swears
+            and not any(char in variant for variant in MULTI_CHAR_VARIANTS)
+        )
+    )
+)
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]')
+_NON_LETTERS_OR_SPACE = re.compile(r'[^a-z ]')
+_NON_ALNUM_OR_SPACE = re.compile(r'[^a-z0-9 ]')
+_LETTER_RUN = re.compile(r'([a-z])\1\1')
+
+# Bounds for the per-filter token verdict memo
+TOKEN_MEMO_SIZE = 8192
+TOKEN_MEMO_MAX_LENGTH = 32
+
+# ==================== STAGE INSTRUMENTATION ====================
+
+SCAN_STAGES = ('prefilter', 'preprocess', 'words', 'squeezed', 'raw_tokens', 'distributed', 'short_form')
+
+# One scan in N is timed stage by stage; hits are counted on every scan
+STAGE_SAMPLE_EVERY = 16
+
+# Default per-message CPU budget. Typical chat scans in well under 1 ms and a benign
+# 4,000-character message in 5-10 ms on a cold token memo; the default leaves room
+# for a loaded host so only crafted messages, which can take several times that,
+# reach it. Once spent, the rest of the message only gets the exact stages, and
+# the verdict is not cached. None or 0 = unlimited.
+SCAN_BUDGET_US = 50_000
+
+class StageStats:
+    """
+    Per-stage scan timings and hit counters. Only verdict-cache misses are
+    scans. Untimed scans cost one counter increment plus one per hit; a sampled
+    scan adds a perf_counter_ns() call per stage. sample_every=1 times every
+    scan, 0 keeps hit counts only.
+    """
+    
+    def __init__(self, sample_every: int = STAGE_SAMPLE_EVERY):
+        self.sample_every = sample_every
+        self.scans = 0
+        self.sampled_scans = 0
+        self.prefilter_short_circuits = 0
+        self.degraded_scans = 0
+        self.hits = dict.fromkeys(SCAN_STAGES, 0)
+        self.timed = dict.fromkeys(SCAN_STAGES, 0)
+        self.total_ns = dict.fromkeys(SCAN_STAGES, 0)
+        self.max_ns = dict.fromkeys(SCAN_STAGES, 0)
+    
+    def start(self) -> Optional['StageTimer']:
+        """Count a scan; returns a timer when this scan is sampled, else None."""
+        self.scans += 1
+        if not self.sample_every or self.scans % self.sample_every:
+            return None
+        self.sampled_scans += 1
+        return StageTimer(self)
+    
+    def merge(self, other: 'StageStats'):
+        """Fold in counters gathered elsewhere (e.g. by a pool worker)."""
+        self.scans += other.scans
+        self.sampled_scans += other.sampled_scans
+        self.prefilter_short_circuits += other.prefilter_short_circuits
+        self.degraded_scans += other.degraded_scans
+        for stage in SCAN_STAGES:
+            self.hits[stage] += other.hits[stage]
+            self.timed[stage] += other.timed[stage]
+            self.total_ns[stage] += other.total_ns[stage]
+            self.max_ns[stage] = max(self.max_ns[stage], other.max_ns[stage])
+    
+    def snapshot(self) -> Dict[str, object]:
+        total = sum(self.total_ns.values())
+        return {
+            'scans': self.scans,
+            'sampled_scans': self.sampled_scans,
+            'sample_every': self.sample_every,
+            'prefilter_short_circuits': self.prefilter_short_circuits,
+            'degraded_scans': self.degraded_scans,
+            'stages': {
+                stage: {
+                    'hits': self.hits[stage],
+                    'timed': self.timed[stage],
+                    'avg_us': round(self.total_ns[stage] / self.timed[stage] / 1000, 2) if self.timed[stage] else 0.0,
+                    'max_us': round(self.max_ns[stage] / 1000, 2),
+                    'time_share': round(self.total_ns[stage] / total, 4) if total else 0.0,
+                }
+                for stage in SCAN_STAGES
+            },
+        }
+
+class StageTimer:
+    """Lap timer for one sampled scan: each lap() charges the time since the last to a stage."""
+    __slots__ = ('stats', 'last')
+    
+    def __init__(self, stats: StageStats):
+        self.stats = stats
+        self.last = time.perf_counter_ns()
+    
+    def lap(self, stage: str):
+        now = time.perf_counter_ns()
+        elapsed = now - self.last
+        stats = self.stats
+        stats.timed[stage] += 1
+        stats.total_ns[stage] += elapsed
+        if elapsed > stats.max_ns[stage]:
+            stats.max_ns[stage] = elapsed
+        self.last = now
+
 # ==================== MAIN FILTER CLASS - ALL ISSUES FIXED ====================
 
 class SwearFilter:
     """COMPLETELY FIXED: All 18 issues resolved while preserving ALL functionality."""
     
-    def __init__(self, swear_words: set, strict_mode: bool = False, enable_phonetics: bool = False):
+    def __init__(self, swear_words: set, strict_mode: bool = False, enable_phonetics: bool = False,
+                 whitelist_words: Iterable[str] = (), context_rules=None,
+                 scan_budget_us: Optional[int] = SCAN_BUDGET_US):
         self.swear_words = set(word.lower().strip() for word in swear_words)
-        self.safe_words = load_safe_words()
+        # Shared dictionary + this guild's whitelist overlay (no per-guild copy)
+        self.safe_words = SafeWordSet(get_shared_safe_words(), whitelist_words)
         self.strict_mode = strict_mode
+        # Context rules are compiled once; guilds without their own share the default
+        self.context_rules = canonical_context_rules(context_rules)
+        self.context_whitelist = ContextWhitelist(dict(self.context_rules)) if self.context_rules \
+            else DEFAULT_CONTEXT_WHITELIST
+        
+        # ISSUE 4&5 FIX: Bounded LRU/TTL verdict cache keyed by message digest
+        self.verdict_cache = VerdictCache(ttl=300)
+        
+        # Per-stage timings/hits (including prefilter short-circuits) and CPU budget
+        # for scans made through this filter directly
+        self.stage_stats = StageStats()
+        self.scan_budget_us = scan_budget_us
         
-        # ISSUE 4&5 FIX: Smart cache management with TTL
-        self.message_cache = {}
-        self.cache_timestamps = {}
-        self.cache_max_size = 500  # Reduced from 1000
-        self.cache_ttl = 300  # 5 minutes TTL
-        self.cache_lock = asyncio.Lock()
+        # Per-token verdicts for the common chat vocabulary, reset with the indexes.
+        # The bot and API threads share filters: reads are plain dict lookups,
+        # inserts, evictions and clears take the lock.
+        self.token_memo: Dict[str, Tuple[bool, str]] = {}
+        self.token_memo_size = TOKEN_MEMO_SIZE
+        self._token_memo_lock = threading.Lock()
         
         # ISSUE 16 FIX: Add the missing repeat_pattern
         self.repeat_pattern = re.compile(r'(.)\1{2,}')
         
-        # ISSUE 14 FIX: Performance monitoring
-        self.query_count = 0
-        self.cache_hits = 0
+        # Stretched-swear and fuzzy indexes, kept in sync with swear_words.
+        # A shared filter is edited in place from the API thread while the bot
+        # thread scans, so index syncs and rule edits are serialized by one lock.
+        self._index_key = None
+        self._rule_set = None
+        self._rules_lock = threading.RLock()
+        self._ensure_indexes()
         
         # ISSUE 12 FIX: Proper logging instead of print
         logger.info(f"[SwearFilter] Initialized with {len(self.swear_words)} swear words, "
                    f"{len(self.safe_words):,} safe words, phonetics={'enabled' if enable_phonetics else 'disabled'}")
     
+    def _ensure_indexes(self):
+        """Bring derived matching structures in line with the word lists if they changed."""
+        key = (id(self.swear_words), len(self.swear_words), self.safe_words.version)
+        if key == self._index_key:
+            return
+        with self._rules_lock:
+            self._sync_indexes()
+    
+    def _sync_indexes(self):
+        """_ensure_indexes body; the caller holds _rules_lock."""
+        key = (id(self.swear_words), len(self.swear_words), self.safe_words.version)
+        if key == self._index_key:
+            return  # Synced by another thread while this one waited for the lock
+        
+        if self._index_key is None:
+            self.fuzzy_index = DeletionIndex(self.swear_words)
+            self.repetition_index = RepetitionIndex(self.swear_words)
+            self.substitution_index = SubstitutionIndex(self.swear_words)
+            self.inflection_index = InflectionIndex(self.swear_words)
+            self.transposition_index = TranspositionIndex(self.swear_words)
+        else:
+            # swear_words was modified directly; apply only the difference to the indexes
+            indexed = self.fuzzy_index.words
+            for word in indexed - self.swear_words:
+                self._unindex_word(word)
+            for word in self.swear_words - indexed:
+                self._index_word(word)
+            # Cached verdicts were computed against the old word lists
+            self.verdict_cache.clear()
+        with self._token_memo_lock:
+            self.token_memo.clear()
+        self._index_key = key
+    
+    def _index_word(self, word: str):
+        self.fuzzy_index.add(word)
+        self.repetition_index.add(word)
+        self.substitution_index.add(word)
+        self.inflection_index.add(word)
+        self.transposition_index.add(word)
+    
+    def _unindex_word(self, word: str):
+        self.fuzzy_index.remove(word)
+        self.repetition_index.remove(word)
+        self.substitution_index.remove(word)
+        self.inflection_index.remove(word)
+        self.transposition_index.remove(word)
+    
+    def _rules_changed(self):
+        """Drop everything computed against the previous rules."""
+        self.verdict_cache.clear()
+        with self._token_memo_lock:
+            self.token_memo.clear()
+        self._rule_set = None
+        self._index_key = (id(self.swear_words), len(self.swear_words), self.safe_words.version)
+    
+    def add_words(self, words: Iterable[str]) -> List[str]:
+        """Add swear words in place, updating every index; returns the words that were new."""
+        with self._rules_lock:
+            self._sync_indexes()
+            added = []
+            for word in words:
+                word = word.lower().strip()
+                if word and word not in self.swear_words:
+                    self.swear_words.add(word)
+                    self._index_word(word)
+                    added.append(word)
+            if added:
+                self._rules_changed()
+            return added
+    
+    def remove_words(self, words: Iterable[str]) -> List[str]:
+        """Remove swear words in place, updating every index; returns the words that were present."""
+        with self._rules_lock:
+            self._sync_indexes()
+            removed = []
+            for word in words:
+                word = word.lower().strip()
+                if word in self.swear_words:
+                    self.swear_words.discard(word)
+                    self._unindex_word(word)
+                    removed.append(word)
+            if removed:
+                self._rules_changed()
+            return removed
+    
+    def set_words(self, words: Iterable[str]):
+        """Make the swear list exactly `words`, touching only the words that differ."""
+        wanted = {word.lower().strip() for word in words} - {''}
+        with self._rules_lock:
+            self.remove_words([word for word in self.swear_words if word not in wanted])
+            self.add_words(wanted - self.swear_words)
+    
+    def add_whitelist_words(self, words: Iterable[str]):
+        """Add guild whitelist words (the shared dictionary is never copied)."""
+        with self._rules_lock:
+            self.safe_words.update(words)
+            self._sync_indexes()
+    
+    def remove_whitelist_words(self, words: Iterable[str]):
+        """Remove guild whitelist words; dictionary words stay safe."""
+        with self._rules_lock:
+            self.safe_words.difference_update(words)
+            self._sync_indexes()
+    
+    def rule_set(self) -> Tuple[FrozenSet[str], FrozenSet[str], ContextRules]:
+        """
+        This filter's rules as hashable data: (swear words, whitelist words,
+        context rules). Enough to rebuild an equivalent filter elsewhere, e.g.
+        in a worker process.
+        """
+        with self._rules_lock:
+            self._sync_indexes()
+            if self._rule_set is None or self._rule_set[0] != self._index_key:
+                rules = (frozenset(self.swear_words), frozenset(self.safe_words.overlay), self.context_rules)
+                self._rule_set = (self._index_key, rules)
+            return self._rule_set[1]
+    
     def _simplify_repeats(self, text: str) -> str:
         """PRESERVED: Reduce repeated characters to 1 (aaa -> a)"""
         return self.repeat_pattern.sub(r'\1', text)
@@ -519,133 +1880,87 @@ class SwearFilter:
         }
         return debug_info
     
-    def _check_context(self, message: str, word: str) -> bool:
+    def _check_context(self, message: Optional['TokenizedMessage'], word: str) -> bool:
         """PRESERVED: Check if word is in a whitelisted context."""
-        if word not in CONTEXT_WHITELIST:
+        if message is None or word not in self.context_whitelist:
             return False
-        
-        rules = CONTEXT_WHITELIST[word]
-        start_time = time.time()
-        
-        try:
-            for pattern in rules['patterns']:
-                if re.search(pattern, message, re.IGNORECASE):
-                    return True
-                
-                # Timeout protection
-                if time.time() - start_time > rules.get('timeout', 1.0):
-                    break
-        except Exception:
-            pass  # ISSUE 14 FIX: Graceful error handling
-        
-        return False
+        return self.context_whitelist.is_whitelisted(message, word)
     
     def _check_suffix_variations(self, word: str) -> bool:
-        """PRESERVED: Suffix checking with enhanced rules."""
-        # Suffix checking
-        for suffix, rules in SUFFIX_RULES.items():
-            if (len(word) >= rules['min_length'] and
-                word.endswith(suffix) and
-                word not in rules['exceptions']):
-                
-                root = word[:-len(suffix)]
-                
-                # Direct root match
-                if root in self.swear_words:
-                    if root not in self.safe_words:  # Safety check
-                        return True
-                
-                # Doubled consonant handling (e.g. shitting → shitt → shit)
-                if len(root) > 2 and root[-1] == root[-2]:
-                    single = root[:-1]
-                    if single in self.swear_words and single not in self.safe_words:
-                        return True
-        
-        # Prefix checking
-        for prefix in ['re', 'un', 'de', 'in', 'pre', 'pro', 'anti', 'non']:
-            if word.startswith(prefix) and len(word) - len(prefix) >= 3:
-                rest = word[len(prefix):]
-                
-                if rest in self.swear_words and rest not in self.safe_words:
-                    return True
-                
-                # Handle doubled prefix consonants
-                if len(rest) > 2 and rest[0] == rest[1]:
-                    single = rest[1:]
-                    if single in self.swear_words and single not in self.safe_words:
-                        return True
-        
-        return False
+        """PRESERVED: Suffix/prefix checking, now one lookup in the precomputed inflection table."""
+        return self.inflection_index.lookup(word, self.safe_words) is not None
+    
+    def inflection_table(self) -> Dict[str, List[str]]:
+        """Every inflected/prefixed form the suffix check accepts, with its swears (for auditing)."""
+        with self._rules_lock:
+            self._sync_indexes()
+            return self.inflection_index.table(self.safe_words)
     
     def _check_short_swears(self, text: str) -> bool:
-        """PRESERVED: Detect short swears."""
-        if len(text) <= 3 and text.lower() in SHORT_SWEARS:
+        """PRESERVED: Detect short swears in a lowercased token."""
+        if len(text) <= 3 and text in SHORT_SWEARS:
             return True
-        
-        # ISSUE 14 FIX: Error handling
-        try:
-            normalized = re.sub(r'[1378245609@#$+*]', '', text.lower())
-            return len(normalized) <= 3 and normalized in SHORT_SWEARS
-        except Exception:
+        # Letters-only tokens are already normalized; only others need the strip
+        if text.isalpha():
             return False
+        normalized = text.translate(SHORT_SWEAR_STRIP_TABLE)
+        return len(normalized) <= 3 and normalized in NORMALIZED_SHORT_SWEARS
     
-    async def _get_cached_result(self, message: str) -> Optional[Tuple[bool, List[str]]]:
-        """ISSUE 4&5 FIX: Proper cache with TTL and cleanup."""
-        async with self.cache_lock:
-            current_time = time.time()
-            
-            if message in self.message_cache:
-                timestamp = self.cache_timestamps.get(message, 0)
-                if current_time - timestamp < self.cache_ttl:
-                    self.cache_hits += 1
-                    return self.message_cache[message]
-                else:
-                    # Remove expired entry
-                    del self.message_cache[message]
-                    del self.cache_timestamps[message]
-            
-            return None
+    @property
+    def cache_hits(self) -> int:
+        """ISSUE 14 FIX: Performance monitoring, read from the verdict cache."""
+        return self.verdict_cache.hits
     
-    async def _cache_message_result(self, message: str, result: Tuple[bool, List[str]]):
-        """ISSUE 4&5 FIX: Smart cache management with automatic cleanup."""
-        async with self.cache_lock:
-            current_time = time.time()
-            
-            # Clean up expired entries if cache is getting full
-            if len(self.message_cache) >= self.cache_max_size:
-                expired_keys = [
-                    key for key, timestamp in self.cache_timestamps.items()
-                    if current_time - timestamp > self.cache_ttl
-                ]
-                
-                for key in expired_keys:
-                    self.message_cache.pop(key, None)
-                    self.cache_timestamps.pop(key, None)
-                
-                # If still full after cleanup, remove oldest entries
-                if len(self.message_cache) >= self.cache_max_size:
-                    oldest_keys = sorted(
-                        self.cache_timestamps.items(), 
-                        key=lambda x: x[1]
-                    )[:self.cache_max_size // 4]  # Remove 25% oldest
-                    
-                    for key, _ in oldest_keys:
-                        self.message_cache.pop(key, None)
-                        self.cache_timestamps.pop(key, None)
-            
-            self.message_cache[message] = result
-            self.cache_timestamps[message] = current_time
+    @property
+    def query_count(self) -> int:
+        return self.verdict_cache.hits + self.verdict_cache.misses
     
-    def _word_is_blocked(self, word: str, original_text: str = "") -> Tuple[bool, str]:
+    def _word_is_blocked(self, word: str, message: 'TokenizedMessage' = None) -> Tuple[bool, str]:
         """PRESERVED: Enhanced word blocking logic - returns (blocked, matched_word)."""
         lower_word = word.lower()
+        verdict = self.token_memo.get(lower_word)
+        if verdict is not None:
+            return verdict
+        
+        verdict = self._classify_word(lower_word, message)
+        # Only swear words depend on the message (context rules); memoize the rest
+        if len(lower_word) <= TOKEN_MEMO_MAX_LENGTH and lower_word not in self.swear_words:
+            with self._token_memo_lock:
+                if len(self.token_memo) >= self.token_memo_size:
+                    del self.token_memo[next(iter(self.token_memo))]  # Oldest entry first
+                self.token_memo[lower_word] = verdict
+        return verdict
+    
+    def _word_is_blocked_exact(self, word: str, message: 'TokenizedMessage' = None) -> Tuple[bool, str]:
+        """
+        Budget fallback for _word_is_blocked: memoized verdicts, direct matches and
+        the stretched/substituted index lookups, all O(len(word)). The fuzzy,
+        affix and bypass checks are skipped, and nothing is memoized.
+        """
+        lower_word = word.lower()
+        verdict = self.token_memo.get(lower_word)
+        if verdict is not None:
+            return verdict
+        if len(lower_word) < 2:
+            return False, ""
+        if lower_word in self.swear_words:
+            if self._check_context(message, lower_word):
+                return False, ""
+            return True, lower_word
+        if lower_word in self.safe_words:
+            return False, ""
+        swear = self.repetition_index.lookup(lower_word) or self.substitution_index.lookup(lower_word)
+        return (True, swear) if swear else (False, "")
+    
+    def _classify_word(self, lower_word: str, message: Optional['TokenizedMessage']) -> Tuple[bool, str]:
+        """The full check ladder for one lowercased word."""
         if len(lower_word) < 2: # Skip very short words
             return False, ""
 
         # Step 1: Safe words check (highest priority)
         if lower_word in self.safe_words:
             if lower_word in self.swear_words:
-                if self._check_context(original_text, lower_word):
+                if self._check_context(message, lower_word):
                     return False, ""
                 return True, lower_word
             else:
@@ -653,12 +1968,13 @@ class SwearFilter:
 
         # Step 2: Direct swear match
         if lower_word in self.swear_words:
-            if self._check_context(original_text, lower_word):
+            if self._check_context(message, lower_word):
                 return False, ""
             return True, lower_word
 
         # Step 2.5: NEW - Check for bypass attempts (hellf, fuckk, shiit, etc.)
-        is_bypass, matched_swear = is_bypass_attempt(lower_word, self.swear_words, self.safe_words)
+        is_bypass, matched_swear = is_bypass_attempt(lower_word, self.swear_words, self.safe_words,
+                                                     self.fuzzy_index)
         if is_bypass:
             return True, matched_swear
 
@@ -670,132 +1986,469 @@ class SwearFilter:
         if self._check_short_swears(lower_word):
             return True, lower_word
         
-        # Step 5: Transposition detection (adjacent character swaps)
-        if len(lower_word) >= 3 and len(lower_word) <= 6:
-            for i in range(len(lower_word) - 1):
-                chars = list(lower_word)
-                chars[i], chars[i + 1] = chars[i + 1], chars[i]
-                swapped = ''.join(chars)
-                if swapped in self.swear_words:
-                    return True, swapped
-        
-        # Step 6: PERFORMANCE FIX - Limited character variant expansion
-        if len(lower_word) <= 5 and COMBINED_SUBSTITUTIONS:  # Reduced from 8
-            variants = expand_all_normalizations(lower_word, max_variants=100)  # Reduced from 500
-            for variant in variants:
-                if variant in self.swear_words:
-                    return True, variant
+        # Step 5: Transposition detection (adjacent character swaps, precomputed)
+        swapped = self.transposition_index.lookup(lower_word)
+        if swapped:
+            return True, swapped
+        
+        # Step 6: Character variants via the substitution skeleton index (no length cap)
+        variant = self.substitution_index.lookup(lower_word)
+        if variant:
+            return True, variant
         
         return False, ""
     
-    async def contains_swear_word(self, message: str) -> Tuple[bool, List[str]]:
+    def check(self, message: str) -> Tuple[bool, List[str]]:
         """
-        ISSUE 2&5 FIX: Main async method with proper return type and async yielding.
-        Returns (contains_swear, list_of_blocked_words) as expected by main.py
+        Synchronous filter core: returns (contains_swear, list_of_blocked_words).
+        Safe to call from any thread, a worker process or an offline tool.
         """
-        self.query_count += 1
+        self._ensure_indexes()
+        return self._check_cached(message)[0][:2]
+    
+    def check_many(self, messages: Iterable[str]) -> List[Tuple[bool, List[str]]]:
+        """Batch form of check(); see _check_batch for the work the batch shares."""
+        self._ensure_indexes()
+        return [result[:2] for result in self._check_batch(messages)[0]]
+    
+    def scan(self, message: str, stage_stats: StageStats = None, budget_us: int = None) -> ScanResult:
+        """check() plus the character span of every hit in the original message."""
+        self._ensure_indexes()
+        return self._check_cached(message, stage_stats, budget_us)[0]
+    
+    def censor(self, message: str, mask_char: str = '*') -> str:
+        """
+        Return message with every hit masked. This is a scan of its own (degraded
+        verdicts are not cached); a caller holding the ScanResult should pass its
+        spans to mask_spans instead.
+        """
+        return mask_spans(message, self.scan(message).spans, mask_char)
+    
+    def _check_cached(self, message: str, stage_stats: StageStats = None,
+                      budget_us: int = None) -> Tuple[ScanResult, bool]:
+        """
+        Returns (verdict, served_from_cache); indexes must already be in sync.
+        stage_stats and budget_us default to this filter's own; a budget_us of
+        0 is unlimited. Degraded verdicts are not cached: they depend on the
+        budget and on host load, not only on the message.
+        """
+        generation = self.verdict_cache.generation
+        result = self.verdict_cache.get(message)
+        if result is not None:
+            return result, True
+        result = self._evaluate(TokenizedMessage(message), stage_stats, budget_us)
+        if not result.degraded:
+            self.verdict_cache.put(message, result, generation)
+        return result, False
+    
+    def _check_batch(self, messages: Iterable[str], stage_stats: StageStats = None,
+                     budget_us: int = None) -> Tuple[List[ScanResult], int]:
+        """
+        _check_cached for a batch: returns the verdicts in order and how many were
+        served without a scan. A message repeated in the batch is scanned once,
+        the verdict cache is read and written under one lock acquisition each,
+        and every distinct word token is normalized once for the whole batch.
+        """
+        messages = list(messages)
+        unique = list(dict.fromkeys(messages))
+        generation = self.verdict_cache.generation
+        fold_memo: Dict[str, Tuple[str, ...]] = {}
+        verdicts = {}
+        fresh = []
+        scanned = 0
+        for message, result in zip(unique, self.verdict_cache.get_many(unique)):
+            if result is None:
+                result = self._evaluate(TokenizedMessage(message, fold_memo), stage_stats, budget_us)
+                scanned += 1
+                if not result.degraded:
+                    fresh.append((message, result))
+            verdicts[message] = result
+        self.verdict_cache.put_many(fresh, generation)
+        return [verdicts[message] for message in messages], len(messages) - scanned
+    
+    def _evaluate(self, tokenized: 'TokenizedMessage', stage_stats: StageStats = None,
+                  budget_us: int = None) -> ScanResult:
+        """Prefilter, then the full scan; no cache. Arguments as for _check_cached."""
+        stats = stage_stats or self.stage_stats
+        if budget_us is None:
+            budget_us = self.scan_budget_us
+        deadline_ns = time.perf_counter_ns() + budget_us * 1000 if budget_us else None
+        timer = stats.start()
+        if self._prefilter_is_clean(tokenized):
+            stats.prefilter_short_circuits += 1
+            if timer:
+                timer.lap('prefilter')
+            return ScanResult(False, [], [])
+        if timer:
+            timer.lap('prefilter')
+        result = self._scan(tokenized, stats, timer, deadline_ns)
+        if result.degraded:
+            stats.degraded_scans += 1
+        return result
+    
+    def _prefilter_is_clean(self, tokenized: 'TokenizedMessage') -> bool:
+        """
+        Conservative clean-message prefilter: True only when _scan is guaranteed
+        to find nothing. Plain messages are decided in one pass over their tokens
+        with memoized verdicts and index lookups; anything the pass cannot reason
+        about exactly (digits, symbols, non-ASCII, spaced or stretched letters)
+        goes to the full pipeline.
+        """
+        message = tokenized.text
+        if not PLAIN_TEXT_CHARS.issuperset(message) or SPACED_LETTERS_PATTERN.search(message):
+            return False
         
-        # Check cache first
-        cached = await self._get_cached_result(message)
-        if cached is not None:
-            return cached
+        words = []
+        base_tokens = None
+        for i, word in enumerate(tokenized.letter_tokens):
+            if not word:
+                continue
+            words.append(word)
+            
+            if len(word) == 1:
+                # Single letters only matter to the short-form check
+                if word in SHORT_SWEARS and word not in self.safe_words:
+                    return False
+                continue
+            
+            # Swears, stretched letters and stretched swears are rewritten or context-checked
+            if word in self.swear_words or _LETTER_RUN.search(word):
+                return False
+            if len(word) >= 3 and self.repetition_index.lookup(word):
+                return False
+            
+            # Word stage (memoized ladder)
+            if self._word_is_blocked(word, tokenized)[0]:
+                return False
+            
+            # Raw-token stage; identical to the word stage unless base folding changes the token
+            if base_tokens is None:
+                base_tokens = tokenized.base_tokens
+            raw = base_tokens[i]
+            if raw != word and len(raw) >= 3 and raw not in self.safe_words and (
+                raw in self.swear_words
+                or self.repetition_index.lookup(raw)
+                or self.substitution_index.lookup(raw)
+            ):
+                return False
         
-        if not message or not self.swear_words:
-            result = (False, [])
-            await self._cache_message_result(message, result)
-            return result
+        # Squeezed and distributed patterns are both the joined letters here
+        squeezed = ''.join(words)
+        if len(squeezed) >= 3 and squeezed not in self.safe_words:
+            if self._word_is_blocked(squeezed, tokenized)[0]:
+                return False
         
-        # ISSUE 2 FIX: Proper async yielding to prevent blocking
-        await asyncio.sleep(0)  # Yield control
+        return True
+    
+    async def contains_swear_word(self, message: str) -> Tuple[bool, List[str]]:
+        """
+        ISSUE 2&5 FIX: Async entry point kept for main.py and the API routes.
+        Returns (contains_swear, list_of_blocked_words); the work is done by check().
+        """
+        await asyncio.sleep(0)  # Yield control before scanning
+        return self.check(message)
+    
+    def _scan(self, tokenized: 'TokenizedMessage', stats: StageStats = None, timer: StageTimer = None,
+              deadline_ns: int = None) -> ScanResult:
+        """
+        Run every detection stage over one message (no cache), recording hit spans.
+        Hits are counted in stats under the stage that produced them; a timer
+        (sampled scans only) is lapped after each stage. Past deadline_ns
+        (perf_counter_ns), the remaining words and whole-message checks get the
+        exact stages only and the result is marked degraded.
+        """
+        if isinstance(tokenized, str):
+            tokenized = TokenizedMessage(tokenized)
+        message = tokenized.text
+        if not message or not self.swear_words:
+            return ScanResult(False, [], [])
         
         blocked_words = []
+        spans = []
+        whole_text_spans = []  # Used only for swears no single token accounts for
+        hits = stats.hits if stats else dict.fromkeys(SCAN_STAGES, 0)
+        
+        def record(stage: str, swear: str, start: int, end: int, whole_text: bool = False):
+            hits[stage] += 1
+            if swear not in blocked_words:
+                blocked_words.append(swear)
+            (whole_text_spans if whole_text else spans).append((start, end, swear))
         
         # === PRESERVED: Enhanced normalization with smart repetition reduction
-        normalized = preprocess_text_for_filtering(message, self.swear_words)
-        words_in_message = re.findall(r'\b[\w\']+\b', normalized)
-        
-        if not words_in_message:
-            result = (False, [])
-            await self._cache_message_result(message, result)
-            return result
-        
-        # === PRESERVED: Main word checking loop with async yielding
-        for i, word in enumerate(words_in_message):
-            if i % 10 == 0:  # ISSUE 2 FIX: Yield every 10 words
-                await asyncio.sleep(0)
-            
-            is_blocked, matched_swear = self._word_is_blocked(word, message)
-            if is_blocked and matched_swear not in blocked_words:
-                blocked_words.append(matched_swear)
+        # Each normalized word keeps the span of the original text it came from
+        tokens = tokenized.normalized_words(self.repetition_index)
+        if timer:
+            timer.lap('preprocess')
         
-        # === PRESERVED: Check squeezed version (removes spaces/punctuation)
-        squeezed = re.sub(r'[^a-zA-Z0-9]', '', normalized)
-        if len(squeezed) >= 3 and squeezed.lower() not in self.safe_words:
-            is_blocked, matched_swear = self._word_is_blocked(squeezed, message)
-            if is_blocked and matched_swear not in blocked_words:
-                blocked_words.append(matched_swear)
+        if not tokens:
+            return ScanResult(False, [], [])
+        
+        words_in_message = [word for word, _, _ in tokens]
+        text_start, text_end = tokens[0][1], tokens[-1][2]
+        degraded = False
+        check_word = self._word_is_blocked
+        
+        # === PRESERVED: Main word checking loop
+        for word, start, end in tokens:
+            if deadline_ns and not degraded and time.perf_counter_ns() > deadline_ns:
+                degraded = True
+                check_word = self._word_is_blocked_exact
+            is_blocked, matched_swear = check_word(word, tokenized)
+            if is_blocked:
+                record('words', matched_swear, start, end)
+        if timer:
+            timer.lap('words')
         
-        await asyncio.sleep(0)  # ISSUE 2 FIX: Yield before heavy processing
+        # === PRESERVED: Check squeezed version (removes spaces/punctuation)
+        if deadline_ns and not degraded and time.perf_counter_ns() > deadline_ns:
+            degraded = True
+            check_word = self._word_is_blocked_exact
+        squeezed = ''.join(words_in_message)
+        if len(squeezed) >= 3 and squeezed not in self.safe_words:
+            is_blocked, matched_swear = check_word(squeezed, tokenized)
+            if is_blocked:
+                record('squeezed', matched_swear, text_start, text_end, whole_text=True)
+        if timer:
+            timer.lap('squeezed')
         
         # === PRESERVED: RAW token checking with normalization
-        raw_tokens = re.findall(r'\S+', message)
-        for i, raw_token in enumerate(raw_tokens):
-            if i % 5 == 0:  # ISSUE 2 FIX: Yield every 5 tokens
-                await asyncio.sleep(0)
-                
-            # Apply full normalization to raw token
-            normalized_raw = normalize_to_base(raw_token.lower())
-            cleaned_raw = re.sub(r'[^a-zA-Z0-9]', '', normalized_raw)
-            
+        for (_, start, end), cleaned_raw in zip(tokenized.raw_tokens, tokenized.base_tokens):
             if len(cleaned_raw) >= 3 and cleaned_raw not in self.safe_words:
                 # Direct swear match
                 if cleaned_raw in self.swear_words:
-                    if cleaned_raw not in blocked_words:
-                        blocked_words.append(cleaned_raw)
+                    record('raw_tokens', cleaned_raw, start, end)
                 
                 # PRESERVED: Check for stretched swear words
-                for swear in self.swear_words:
-                    if len(cleaned_raw) >= len(swear) and matches_with_repetitions(cleaned_raw, swear):
-                        if swear not in blocked_words:
-                            blocked_words.append(swear)
-                        break
+                swear = self.repetition_index.lookup(cleaned_raw)
+                if swear:
+                    record('raw_tokens', swear, start, end)
                 
-                # PRESERVED: Character variants for non-safe words (with limits)
-                if COMBINED_SUBSTITUTIONS and len(cleaned_raw) <= 5:  # Reduced from 8
-                    variants = expand_all_normalizations(cleaned_raw, max_variants=100)  # Reduced from 500
-                    for variant in variants:
-                        if variant in self.swear_words:
-                            if variant not in blocked_words:
-                                blocked_words.append(variant)
-                            break
+                # PRESERVED: Character variants for non-safe words
+                variant = self.substitution_index.lookup(cleaned_raw)
+                if variant:
+                    record('raw_tokens', variant, start, end)
+        if timer:
+            timer.lap('raw_tokens')
         
         # === PRESERVED: Advanced pattern detection
-        distributed_pattern = re.sub(r'[^a-zA-Z0-9]', '', message.lower())
+        if deadline_ns and not degraded and time.perf_counter_ns() > deadline_ns:
+            degraded = True
+            check_word = self._word_is_blocked_exact
+        distributed_pattern = tokenized.distributed
         if len(distributed_pattern) >= 3 and distributed_pattern not in self.safe_words:
-            is_blocked, matched_swear = self._word_is_blocked(distributed_pattern, message)
-            if is_blocked and matched_swear not in blocked_words:
-                blocked_words.append(matched_swear)
+            is_blocked, matched_swear = check_word(distributed_pattern, tokenized)
+            if is_blocked:
+                record('distributed', matched_swear, *tokenized.text_span, whole_text=True)
+        if timer:
+            timer.lap('distributed')
         
         # === PRESERVED: Short-form swears (final check)
         if (len(words_in_message) == 1 and
             len(words_in_message[0]) <= 3 and
             words_in_message[0] in SHORT_SWEARS and
             words_in_message[0].lower() not in self.safe_words):
-            if words_in_message[0] not in blocked_words:
-                blocked_words.append(words_in_message[0])
+            record('short_form', words_in_message[0], text_start, text_end)
+        if timer:
+            timer.lap('short_form')
         
-        # ISSUE 5 FIX: Return proper tuple format
-        contains_swear = len(blocked_words) > 0
-        result = (contains_swear, blocked_words)
+        located = {swear for _, _, swear in spans}
+        spans.extend(span for span in whole_text_spans if span[2] not in located)
         
-        # Cache the result
-        await self._cache_message_result(message, result)
-        
-        return result
+        # ISSUE 5 FIX: Return proper tuple format
+        return ScanResult(len(blocked_words) > 0, blocked_words, sorted(set(spans)), degraded)
     
     async def test_filter(self, variations: List[str]) -> Dict[str, Tuple[bool, List[str]]]:
         """PRESERVED: Test the filter against a list of variations"""
-        return {var: await self.contains_swear_word(var) for var in variations}
+        return dict(zip(variations, self.check_many(variations)))
+
+# ==================== SHARED COMPILED FILTERS ====================
+
+class FilterRegistry:
+    """
+    Content-addressed store of compiled filters. Guilds whose rule-sets hash the
+    same share one SwearFilter (indexes, token memo, verdict cache); a compiled
+    filter is dropped as soon as no guild refers to it any more.
+    """
+    
+    def __init__(self):
+        self._filters: 'weakref.WeakValueDictionary[str, SwearFilter]' = weakref.WeakValueDictionary()
+        # Each compiled filter's key and the guild handles using it
+        self._keys: 'weakref.WeakKeyDictionary[SwearFilter, str]' = weakref.WeakKeyDictionary()
+        self._users: 'weakref.WeakKeyDictionary[SwearFilter, weakref.WeakSet]' = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._filters)
+    
+    @staticmethod
+    def rules_digest(swear_words: Iterable[str], whitelist_words: Iterable[str] = (),
+                     context_rules: ContextRules = frozenset()) -> str:
+        digest = hashlib.blake2b(digest_size=16)
+        for words in (swear_words, whitelist_words):
+            for word in sorted({word.lower().strip() for word in words} - {''}):
+                digest.update(word.encode('utf-8', 'surrogatepass') + b'\n')
+            digest.update(b'\x00')  # Separates swear words from whitelist words
+        for word, patterns in sorted(context_rules):
+            digest.update('\x01'.join((word,) + patterns).encode('utf-8', 'surrogatepass') + b'\n')
+        return digest.hexdigest()
+    
+    def acquire(self, swear_words: Iterable[str], whitelist_words: Iterable[str] = (),
+                user: object = None, context_rules=None) -> SwearFilter:
+        """The compiled filter for these rules, built if needed; user (a GuildFilter) is recorded as using it."""
+        swear_words, whitelist_words = set(swear_words), set(whitelist_words)
+        context_rules = canonical_context_rules(context_rules)
+        key = self.rules_digest(swear_words, whitelist_words, context_rules)
+        with self._lock:
+            return self._acquire_locked(key, swear_words, whitelist_words, context_rules, user)
+    
+    def _acquire_locked(self, key: str, swear_words: Set[str], whitelist_words: Set[str],
+                        context_rules: ContextRules, user: object) -> SwearFilter:
+        compiled = self._filters.get(key)
+        if compiled is None:
+            compiled = SwearFilter(swear_words, whitelist_words=whitelist_words, context_rules=context_rules)
+            self._filters[key] = compiled
+            self._keys[compiled] = key
+            self._users[compiled] = weakref.WeakSet()
+        if user is not None:
+            self._users[compiled].add(user)
+        return compiled
+    
+    def update(self, user: object, compiled: SwearFilter, swear_words: Iterable[str],
+               whitelist_words: Iterable[str], edit: Callable[[SwearFilter], object]) -> SwearFilter:
+        """
+        The compiled filter user holds once its rules change from compiled's to
+        the given ones. A filter already compiled for the new rules is shared.
+        Otherwise, if user is compiled's only user, edit(compiled) changes it in
+        place (only the changed words are re-indexed) and it is re-keyed;
+        a filter other guilds share is never edited, the new rules are built
+        separately instead (copy-on-write). Context rules are kept as they are.
+        """
+        swear_words, whitelist_words = set(swear_words), set(whitelist_words)
+        context_rules = compiled.context_rules
+        key = self.rules_digest(swear_words, whitelist_words, context_rules)
+        with self._lock:
+            users = self._users.get(compiled)
+            if users is not None:
+                users.discard(user)
+                if not users and key not in self._filters:
+                    old_key = self._keys.get(compiled)
+                    if self._filters.get(old_key) is compiled:
+                        del self._filters[old_key]
+                    edit(compiled)
+                    self._filters[key] = compiled
+                    self._keys[compiled] = key
+                    users.add(user)
+                    return compiled
+            return self._acquire_locked(key, swear_words, whitelist_words, context_rules, user)
+
+FILTER_REGISTRY = FilterRegistry()
+
+class GuildFilter:
+    """
+    One guild's handle on a shared compiled SwearFilter. The handle holds only
+    per-guild counters. A rule change edits the compiled filter in place when
+    this guild is its only user; otherwise the handle is re-pointed at the
+    compiled filter for the new rule-set (copy-on-write), so state other guilds
+    share is never edited.
+    """
+    
+    def __init__(self, swear_words: Iterable[str], whitelist_words: Iterable[str] = (),
+                 registry: FilterRegistry = None, scan_budget_us: Optional[int] = SCAN_BUDGET_US,
+                 context_rules=None):
+        self.registry = registry if registry is not None else FILTER_REGISTRY
+        self.compiled = self.registry.acquire(swear_words, whitelist_words, user=self, context_rules=context_rules)
+        self.query_count = 0
+        self.cache_hits = 0
+        # Stage stats and the CPU budget stay with the guild when a rule change re-points the handle
+        self.stage_stats = StageStats()
+        self.scan_budget_us = scan_budget_us  # None or 0 = unlimited
+    
+    @property
+    def swear_words(self) -> FrozenSet[str]:
+        """Snapshot of the swear list; change rules through add_words/remove_words/set_words."""
+        return frozenset(self.compiled.swear_words)
+    
+    @property
+    def safe_words(self) -> SafeWordSet:
+        return self.compiled.safe_words
+    
+    @property
+    def verdict_cache(self) -> VerdictCache:
+        return self.compiled.verdict_cache
+    
+    def rule_set(self) -> Tuple[FrozenSet[str], FrozenSet[str], ContextRules]:
+        return self.compiled.rule_set()
+    
+    def check(self, message: str) -> Tuple[bool, List[str]]:
+        return self.scan(message)[:2]
+    
+    def check_many(self, messages: Iterable[str]) -> List[Tuple[bool, List[str]]]:
+        compiled = self.compiled
+        compiled._ensure_indexes()
+        results, cached = compiled._check_batch(messages, self.stage_stats, self.scan_budget_us or 0)
+        self.query_count += len(results)
+        self.cache_hits += cached
+        return [result[:2] for result in results]
+    
+    def scan(self, message: str) -> ScanResult:
+        compiled = self.compiled
+        compiled._ensure_indexes()
+        result, cached = compiled._check_cached(message, self.stage_stats, self.scan_budget_us or 0)
+        self.query_count += 1
+        self.cache_hits += cached
+        return result
+    
+    def censor(self, message: str, mask_char: str = '*') -> str:
+        """Masked copy of a message; a query like check(). With a ScanResult in hand, use mask_spans."""
+        return mask_spans(message, self.scan(message).spans, mask_char)
+    
+    async def contains_swear_word(self, message: str) -> Tuple[bool, List[str]]:
+        """Same contract as SwearFilter.contains_swear_word."""
+        await asyncio.sleep(0)  # Yield control before scanning
+        return self.check(message)
+    
+    def _rebind(self, swear_words: Iterable[str], whitelist_words: Iterable[str],
+                edit: Callable[[SwearFilter], object]):
+        self.compiled = self.registry.update(self, self.compiled, swear_words, whitelist_words, edit)
+    
+    def add_words(self, words: Iterable[str]) -> List[str]:
+        current = self.compiled.swear_words
+        added = [word for word in dict.fromkeys(word.lower().strip() for word in words)
+                 if word and word not in current]
+        if added:
+            self._rebind(current | set(added), self.compiled.safe_words.overlay,
+                         lambda compiled: compiled.add_words(added))
+        return added
+    
+    def remove_words(self, words: Iterable[str]) -> List[str]:
+        current = self.compiled.swear_words
+        removed = [word for word in dict.fromkeys(word.lower().strip() for word in words)
+                   if word in current]
+        if removed:
+            self._rebind(current - set(removed), self.compiled.safe_words.overlay,
+                         lambda compiled: compiled.remove_words(removed))
+        return removed
+    
+    def set_words(self, words: Iterable[str]):
+        wanted = {word.lower().strip() for word in words} - {''}
+        if wanted != self.compiled.swear_words:
+            self._rebind(wanted, self.compiled.safe_words.overlay,
+                         lambda compiled: compiled.set_words(wanted))
+    
+    def add_whitelist_words(self, words: Iterable[str]):
+        overlay = self.compiled.safe_words.overlay
+        added = ({word.lower().strip() for word in words} - {''}) - overlay
+        if added:
+            self._rebind(self.compiled.swear_words, overlay | added,
+                         lambda compiled: compiled.add_whitelist_words(added))
+    
+    def remove_whitelist_words(self, words: Iterable[str]):
+        overlay = self.compiled.safe_words.overlay
+        removed = overlay & {word.lower().strip() for word in words}
+        if removed:
+            self._rebind(self.compiled.swear_words, overlay - removed,
+                         lambda compiled: compiled.remove_whitelist_words(removed))
+
 
 # ==================== SELF-TEST ====================
 
@@ -822,10 +2475,13 @@ if __name__ == "__main__":
             "help", "hello", "classic", "assessment", "bass", "class", 
             "grass", "pass", "glass", "shell", "well", "bell",
             "association", "assignment", "assist", "passage",
+            
+            # Stretched 'u' must not be read as the 'uu' -> 'w' variant
+            "ccccuuun+", "pass shell ccccuuun+",
         ]
         
         # Initialize filter
-        swear_words = {"fuck", "shit", "damn", "hell", "ass", "bitch"}
+        swear_words = {"fuck", "shit", "damn", "hell", "ass", "bitch", "cunt"}
         sf = SwearFilter(swear_words)
         
         print("🧪 Testing PERFECTLY FIXED SwearFilter:")
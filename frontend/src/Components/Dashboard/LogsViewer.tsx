@@ -172,6 +172,9 @@ const LogsViewer: React.FC<LogsViewerProps> = ({ guildId }) => {
       case 'delete + timeout + kick':
       case 'delete_timeout_kick':
         return 'bg-orange-100 text-orange-700 border-orange-200';
+      case 'censor + repost':
+      case 'censor_repost':
+        return 'bg-green-100 text-green-700 border-green-200';
       case 'timeout':
         return 'bg-blue-100 text-blue-700 border-blue-200';
       case 'kick':
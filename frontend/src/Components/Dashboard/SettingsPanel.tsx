@@ -190,6 +190,7 @@ const SettingsPanel: React.FC<SettingsPanelProps> = ({ guildId, guildData, onUpd
       delete_only: { emoji: '🗑️', text: 'Only Delete' },
       delete_timeout: { emoji: '⏰', text: 'Delete + Timeout' },
       delete_timeout_kick: { emoji: '👢', text: 'Delete + Timeout + Kick' },
+      censor_repost: { emoji: '✏️', text: 'Censor + Repost' },
     };
     return actionMap[action as keyof typeof actionMap] || { emoji: '❓', text: 'Unknown' };
   };
@@ -248,6 +249,7 @@ const SettingsPanel: React.FC<SettingsPanelProps> = ({ guildId, guildData, onUpd
     { value: 'delete_only', emoji: '🗑️', text: 'Only Delete', desc: 'Just remove the message' },
     { value: 'delete_timeout', emoji: '⏰', text: 'Delete + Timeout', desc: 'Remove message and timeout repeat offenders' },
     { value: 'delete_timeout_kick', emoji: '👢', text: 'Delete + Timeout + Kick', desc: 'Full escalation for persistent violators' },
+    { value: 'censor_repost', emoji: '✏️', text: 'Censor + Repost', desc: 'Repost the message with swear words masked' },
   ];
 
   return (